@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Agent History Indexer
+
+Embeds committed agent journals and todos into a per-project Qdrant
+collection so the RAG service's /retrieve route can answer questions over
+agent history. Documents are picked up incrementally with
+ai_agent_utils.changes_since(), split along markdown headings, and stored
+in the same payload layout langchain's Qdrant vector store uses.
+
+Each chunk's point id is derived from its document path and content, so
+chunks that are already in the collection are never embedded again, and
+chunks that disappeared from an edited document are deleted. The commit
+cursor of the last indexed run is kept in a local state file.
+
+Usage:
+    python agent_indexer.py [--repo PATH] [--collection NAME] [--follow]
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from hashlib import md5
+from pathlib import Path
+from typing import Callable, Optional
+
+from qdrant_client.http import models as rest
+
+from ai_agent_utils import changes_since, follow_changes, get_repo_root, load_config
+from rag_utils import build_collection_config
+
+
+# Configuration defaults
+MAX_CHUNK_CHARS = 2000
+EMBED_BATCH_SIZE = 96
+RETRIEVE_BATCH_SIZE = 256
+INDEX_STATE_FILE = ".agent_index_state.json"
+PATH_FIELD = "metadata.path"
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# Serializes updates to the index state file within this process
+_state_lock = threading.Lock()
+
+
+def _split_long(text: str, max_chars: int) -> list[str]:
+    """Split text on paragraph boundaries into pieces of at most max_chars (where possible)."""
+    pieces = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if len(candidate) <= max_chars or not current:
+            current = candidate
+        else:
+            pieces.append(current)
+            current = paragraph
+    if current:
+        pieces.append(current)
+
+    # A single paragraph longer than max_chars is cut hard
+    return [piece[i:i + max_chars] for piece in pieces for i in range(0, len(piece), max_chars)]
+
+
+def chunk_markdown(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[dict]:
+    """
+    Split a markdown document along its headings.
+
+    Each section runs from a heading to the next heading; text before the
+    first heading is its own section. Sections longer than max_chars are
+    split on paragraph boundaries. Headings inside fenced code blocks are
+    ignored.
+
+    Args:
+        text: Markdown document
+        max_chars: Maximum chunk length in characters
+
+    Returns:
+        list[dict]: Chunks with "text" and "heading" (the heading path, for
+            example "Journal > Progress", or "" before the first heading)
+    """
+    sections = []  # (heading path, lines)
+    path = []
+    lines = []
+    in_fence = False
+
+    for line in text.splitlines():
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            sections.append((" > ".join(title for _, title in path), lines))
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+            lines = [line]
+        else:
+            lines.append(line)
+    sections.append((" > ".join(title for _, title in path), lines))
+
+    chunks = []
+    for heading, section_lines in sections:
+        section = "\n".join(section_lines).strip()
+        if not section or ("\n" not in section and _HEADING_RE.match(section)):
+            continue  # Empty section or a bare heading
+        for piece in _split_long(section, max_chars):
+            if piece.strip():
+                chunks.append({"text": piece.strip(), "heading": heading})
+    return chunks
+
+
+def chunk_point_id(relative_path: str, text: str) -> str:
+    """
+    Return the Qdrant point id of a chunk.
+
+    Args:
+        relative_path: Document path relative to the repository root
+        text: Chunk text
+
+    Returns:
+        str: Hex digest accepted by Qdrant as a UUID
+    """
+    return md5(f"{relative_path}\0{text}".encode("utf-8")).hexdigest()
+
+
+def default_collection_name(repo_root: Path) -> str:
+    """
+    Get the default per-project collection name.
+
+    Args:
+        repo_root: Repository root
+
+    Returns:
+        str: "agent_history_<repository directory name>"
+    """
+    return "agent_history_" + re.sub(r"[^A-Za-z0-9_-]", "_", Path(repo_root).resolve().name)
+
+
+def get_index_state_path(repo_root: Path, config: Optional[dict] = None) -> Path:
+    """
+    Get the path of the indexer state file (cursor per collection).
+
+    The state is local to the machine doing the indexing; it is not committed.
+
+    Args:
+        repo_root: Repository root
+        config: Optional configuration (loaded from repo_root if not provided)
+
+    Returns:
+        Path: Path to the JSON state file
+    """
+    if config is None:
+        config = load_config(repo_root)
+    return Path(repo_root) / config['AGENT_DOCS_DIR'] / INDEX_STATE_FILE
+
+
+def load_index_cursor(repo_root: Path, collection_name: str, config: Optional[dict] = None) -> Optional[str]:
+    """Return the commit cursor last indexed into a collection, if any."""
+    try:
+        return json.loads(get_index_state_path(repo_root, config).read_text()).get(collection_name)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_index_cursor(
+    repo_root: Path,
+    collection_name: str,
+    cursor: Optional[str],
+    config: Optional[dict] = None
+) -> None:
+    """
+    Record the commit cursor indexed into a collection.
+
+    The state file is shared by every collection, so the read-modify-write is
+    serialized across threads and processes, and each write goes through its
+    own temporary file.
+    """
+    state_path = get_index_state_path(repo_root, config)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with _state_lock, open(state_path.with_suffix(".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            state = json.loads(state_path.read_text())
+        except (FileNotFoundError, ValueError):
+            state = {}
+        state[collection_name] = cursor
+        with tempfile.NamedTemporaryFile("w", dir=state_path.parent, prefix=state_path.name + ".",
+                                         suffix=".tmp", delete=False) as tmp_file:
+            tmp_file.write(json.dumps(state, indent=2, sort_keys=True) + "\n")
+        try:
+            os.replace(tmp_file.name, state_path)
+        except OSError:
+            os.unlink(tmp_file.name)
+            raise
+
+
+def _direct_call(fn: Callable, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def _collection_exists(client, collection_name: str, qdrant_call: Callable) -> bool:
+    collections = qdrant_call(client.get_collections).collections
+    return any(collection.name == collection_name for collection in collections)
+
+
+def index_changes(
+    client,
+    collection_name: str,
+    embed_documents: Callable[[list[str]], list[list[float]]],
+    changes: list[dict],
+    repo_root: Path,
+    profile=None,
+    max_chars: int = MAX_CHUNK_CHARS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    qdrant_call: Optional[Callable] = None
+) -> dict:
+    """
+    Embed and upsert the chunks of changed documents.
+
+    Chunks whose point id is already in the collection are skipped, and
+    chunks no longer present in a changed document are deleted. The
+    collection is created on first use with the given profile.
+
+    Args:
+        client: QdrantClient
+        collection_name: Target collection
+        embed_documents: Callable embedding a list of texts (e.g.
+            CohereEmbeddings.embed_documents)
+        changes: Changes with content, as returned by changes_since()
+        repo_root: Repository root the change paths belong to
+        profile: Collection profile used when creating the collection
+        max_chars: Maximum chunk length in characters
+        batch_size: Number of texts per embedding call
+        qdrant_call: Optional wrapper for Qdrant calls, called as
+            qdrant_call(fn, *args, **kwargs) (e.g. an UpstreamLimiter.call)
+
+    Returns:
+        dict: Counts of documents, chunks embedded, skipped and deleted
+
+    Raises:
+        ValueError: If the collection profile is invalid
+    """
+    qdrant_call = qdrant_call or _direct_call
+    repo_root = Path(repo_root)
+    exists = _collection_exists(client, collection_name, qdrant_call)
+
+    # Chunk every changed document; one entry per distinct point id
+    chunks = {}
+    ids_by_path = {}
+    for change in changes:
+        relative_path = Path(change["path"]).relative_to(repo_root).as_posix()
+        ids = ids_by_path.setdefault(relative_path, [])
+        for number, chunk in enumerate(chunk_markdown(change["content"], max_chars)):
+            point_id = chunk_point_id(relative_path, chunk["text"])
+            ids.append(point_id)
+            chunks[point_id] = (chunk["text"], {
+                "path": relative_path,
+                "doc_type": change["doc_type"],
+                "agent_name": change["agent_name"],
+                "timestamp": change["timestamp"],
+                "heading": chunk["heading"],
+                "chunk": number,
+                "blob": change["blob"],
+            })
+
+    # Skip chunks that are already stored
+    pending = list(chunks)
+    if exists:
+        stored = set()
+        for start in range(0, len(pending), RETRIEVE_BATCH_SIZE):
+            records = qdrant_call(
+                client.retrieve,
+                collection_name=collection_name,
+                ids=pending[start:start + RETRIEVE_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False,
+            )
+            stored.update(str(record.id).replace("-", "") for record in records)
+        pending = [point_id for point_id in pending if point_id not in stored]
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        texts = [chunks[point_id][0] for point_id in batch]
+        vectors = embed_documents(texts)
+
+        if not exists:
+            collection_config, payload_indexes = build_collection_config(profile)
+            qdrant_call(
+                client.recreate_collection,
+                collection_name=collection_name,
+                vectors_config=rest.VectorParams(size=len(vectors[0]), distance=rest.Distance.COSINE),
+                **collection_config,
+            )
+            payload_indexes.setdefault(PATH_FIELD, rest.PayloadSchemaType.KEYWORD)
+            for field_name, field_schema in payload_indexes.items():
+                qdrant_call(client.create_payload_index, collection_name=collection_name,
+                            field_name=field_name, field_schema=field_schema)
+            exists = True
+
+        qdrant_call(
+            client.upsert,
+            collection_name=collection_name,
+            points=rest.Batch.construct(
+                ids=batch,
+                vectors=vectors,
+                payloads=[{"page_content": text, "metadata": metadata}
+                          for text, metadata in (chunks[point_id] for point_id in batch)],
+            ),
+        )
+
+    # Drop chunks that no longer exist in the changed documents
+    deleted = 0
+    if exists:
+        for relative_path, ids in ids_by_path.items():
+            stale_filter = rest.Filter(
+                must=[rest.FieldCondition(key=PATH_FIELD, match=rest.MatchValue(value=relative_path))],
+                must_not=[rest.HasIdCondition(has_id=ids)] if ids else None,
+            )
+            deleted += qdrant_call(client.count, collection_name=collection_name,
+                                   count_filter=stale_filter, exact=True).count
+            qdrant_call(client.delete, collection_name=collection_name,
+                        points_selector=rest.FilterSelector(filter=stale_filter))
+
+    return {
+        "documents": len(ids_by_path),
+        "chunks_embedded": len(pending),
+        "chunks_skipped": len(chunks) - len(pending),
+        "chunks_deleted": deleted,
+    }
+
+
+def index_agent_documents(
+    client,
+    embed_documents: Callable[[list[str]], list[list[float]]],
+    collection_name: Optional[str] = None,
+    repo_root: Optional[Path] = None,
+    profile=None,
+    qdrant_call: Optional[Callable] = None
+) -> dict:
+    """
+    Index the agent documents committed since the last run.
+
+    The first run (or a run after the collection was removed) indexes every
+    document at HEAD. The new cursor is saved only after the run succeeds.
+    Documents removed from the tree (for example by archive compaction)
+    stay in the collection as history.
+
+    Args:
+        client: QdrantClient
+        embed_documents: Callable embedding a list of texts
+        collection_name: Target collection (defaults to default_collection_name())
+        repo_root: Repository root (defaults to the current repository); its
+            .ai_agent_config decides where documents and the state file live
+        profile: Collection profile used when creating the collection
+        qdrant_call: Optional wrapper for Qdrant calls (see index_changes())
+
+    Returns:
+        dict: {"collection_name", "cursor", "documents", "chunks_embedded",
+            "chunks_skipped", "chunks_deleted"}
+    """
+    repo_root = Path(repo_root) if repo_root else get_repo_root()
+    collection_name = collection_name or default_collection_name(repo_root)
+
+    config = load_config(repo_root)
+    cursor = load_index_cursor(repo_root, collection_name, config)
+    if cursor is not None and not _collection_exists(client, collection_name, qdrant_call or _direct_call):
+        cursor = None  # The collection was removed; start over
+    batch = changes_since(cursor, repo_root=repo_root, config=config)
+
+    result = index_changes(client, collection_name, embed_documents, batch["changes"], repo_root,
+                           profile=profile, qdrant_call=qdrant_call)
+    save_index_cursor(repo_root, collection_name, batch["cursor"], config)
+    return {"collection_name": collection_name, "cursor": batch["cursor"], **result}
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Embed agent journals and todos into Qdrant")
+    parser.add_argument("--repo", help="repository with the agent documents (default: current)")
+    parser.add_argument("--collection", help="collection name (default: agent_history_<repo name>)")
+    parser.add_argument("--profile", help="collection profile used when creating the collection")
+    parser.add_argument("--follow", action="store_true", help="keep indexing new commits as they land")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from langchain.embeddings import CohereEmbeddings
+    from qdrant_client import QdrantClient
+
+    load_dotenv()
+    if args.repo:
+        os.chdir(args.repo)
+    repo_root = get_repo_root()
+    collection_name = args.collection or default_collection_name(repo_root)
+    client = QdrantClient(
+        url=os.environ.get('qdrant_url'),
+        prefer_grpc=os.environ.get('qdrant_prefer_grpc', 'true').lower() == 'true',
+        api_key=os.environ.get('qdrant_api_key'),
+    )
+    embeddings = CohereEmbeddings(model="multilingual-22-12", cohere_api_key=os.environ.get('cohere_api_key'))
+
+    result = index_agent_documents(client, embeddings.embed_documents, collection_name, repo_root, args.profile)
+    print(json.dumps(result), flush=True)
+    if args.follow:
+        config = load_config(repo_root)
+        for batch in follow_changes(result["cursor"], poll_interval=args.poll_interval,
+                                    repo_root=repo_root, config=config):
+            result = index_changes(client, collection_name, embeddings.embed_documents, batch["changes"],
+                                   repo_root, profile=args.profile)
+            save_index_cursor(repo_root, collection_name, batch["cursor"], config)
+            print(json.dumps({"collection_name": collection_name, "cursor": batch["cursor"], **result}),
+                  flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
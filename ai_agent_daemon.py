@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+AI Agent Drop-off Daemon
+
+A long-lived process that serves drop-off, list, search and read requests
+over a local Unix socket, so agents written in any language can drop off
+documents without paying interpreter startup and module import on every
+call. The daemon keeps the repository root warm and batches the commits of
+concurrent drop-offs into a single git commit.
+
+Protocol:
+    Every message, in both directions, is a 4-byte big-endian length followed
+    by that many bytes of UTF-8 JSON. A connection may carry any number of
+    request/response pairs.
+
+    Request:  {"op": "drop_off", "content": "...", "doc_type": "journal", "agent_name": "bot"}
+    Response: {"ok": true, "result": {"path": "/repo/ai_agents/journals/journal_..._bot.md"}}
+    Error:    {"ok": false, "error": "Document content cannot be empty", "type": "ValueError"}
+
+Operations:
+    ping                                    -> "pong"
+    drop_off  content, doc_type, agent_name, commit_message, timestamp,
+              author_name, author_email, sync (default true: reply after commit)
+                                            -> {"path": ...}
+    list      doc_type, agent_name, include_archived -> [path, ...]
+    search    query, doc_type, agent_name, since, limit -> [result, ...]
+    read      path                          -> content
+    changes   cursor, doc_type, include_content,
+              wait (seconds to block while there are no changes, default 0)
+                                            -> {"cursor": ..., "changes": [...]}
+
+Usage:
+    python ai_agent_daemon.py serve [--socket PATH]
+    python ai_agent_daemon.py send '{"op": "ping"}' [--socket PATH]
+"""
+
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional
+
+from ai_agent_utils import (
+    changes_since,
+    commit_agent_paths,
+    default_commit_message,
+    get_document_path,
+    get_repo_root,
+    get_search_index_path,
+    index_agent_document,
+    list_agent_documents,
+    load_config,
+    read_agent_document,
+    save_agent_document,
+    search_agent_documents,
+)
+
+
+# Configuration defaults
+DAEMON_SOCKET = ".ai_agent_daemon.sock"
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+BATCH_WINDOW = 0.002
+MAX_BATCH_SIZE = 256
+CHANGES_POLL_INTERVAL = 1.0
+
+_HEADER = struct.Struct(">I")
+
+
+def send_message(sock: socket.socket, message) -> None:
+    """
+    Send one length-prefixed JSON message.
+
+    Args:
+        sock: Connected socket
+        message: JSON-serializable message
+    """
+    payload = json.dumps(message, default=str).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, or None if the peer closed the connection first."""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket):
+    """
+    Receive one length-prefixed JSON message.
+
+    Args:
+        sock: Connected socket
+
+    Returns:
+        The decoded message, or None if the connection was closed
+
+    Raises:
+        ValueError: If the message is larger than MAX_MESSAGE_BYTES
+    """
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message too large: {size} bytes")
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+class _PendingDrop:
+    """A written document waiting for the committer."""
+
+    __slots__ = ("path", "content", "commit_message", "author", "future")
+
+    def __init__(self, path: Path, content: str, commit_message: str, author: tuple):
+        self.path = path
+        self.content = content
+        self.commit_message = commit_message
+        self.author = author
+        self.future = Future()
+
+
+class DropOffService:
+    """
+    Drop-off operations with warm repository state and batched commits.
+
+    Documents are written as soon as a request arrives. A single committer
+    thread collects the drops that arrive within BATCH_WINDOW of each other
+    and commits each author's documents together, so concurrent writers
+    never contend for the git index.
+    """
+
+    def __init__(
+        self,
+        repo_root: Optional[Path] = None,
+        batch_window: float = BATCH_WINDOW,
+        max_batch_size: int = MAX_BATCH_SIZE
+    ):
+        """
+        Args:
+            repo_root: Repository to serve (defaults to the current one)
+            batch_window: Seconds to wait for more drops before committing
+            max_batch_size: Maximum number of documents per commit
+        """
+        self.repo_root = Path(repo_root) if repo_root else get_repo_root()
+        self.config = load_config(self.repo_root)
+        docs_dir = (self.repo_root / self.config['AGENT_DOCS_DIR']).resolve()
+        self._document_dirs = {docs_dir / self.config['JOURNAL_DIR'], docs_dir / self.config['TODO_DIR']}
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._write_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._committed = threading.Condition()
+        self._committer = threading.Thread(target=self._commit_loop, name="committer", daemon=True)
+        self._committer.start()
+
+    def drop_off(
+        self,
+        content: str,
+        doc_type: str,
+        agent_name: Optional[str] = None,
+        commit_message: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        author_name: Optional[str] = None,
+        author_email: Optional[str] = None,
+        sync: bool = True
+    ) -> dict:
+        """
+        Save a document and queue it for commit.
+
+        Args:
+            content: Document content
+            doc_type: Type of document ("journal" or "todo")
+            agent_name: Name of the agent (uses default if not provided)
+            commit_message: Git commit message (generates default if not provided)
+            timestamp: Optional timestamp string
+            author_name: Optional git author name
+            author_email: Optional git author email
+            sync: Wait until the document is committed before returning
+
+        Returns:
+            dict: {"path": path to the document}
+
+        Raises:
+            ValueError: If content or parameters are invalid
+            RuntimeError: If the commit fails (only when sync is true)
+        """
+        if agent_name is None:
+            agent_name = self.config['DEFAULT_AGENT_NAME']
+        if commit_message is None:
+            commit_message = default_commit_message(doc_type, agent_name)
+
+        # Raises ValueError for a timestamp that does not match TIMESTAMP_FORMAT
+        filepath = get_document_path(doc_type, agent_name, timestamp, repo_root=self.repo_root, config=self.config)
+        with self._write_lock:
+            save_agent_document(content, filepath, overwrite=False)
+
+        pending = _PendingDrop(filepath, content, commit_message, (author_name, author_email))
+        self._queue.put(pending)
+        if sync:
+            pending.future.result()
+        return {"path": str(filepath)}
+
+    def _commit_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=self.batch_window)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch: list) -> None:
+        """Commit a batch, one commit per author identity."""
+        by_author = {}
+        for pending in batch:
+            by_author.setdefault(pending.author, []).append(pending)
+
+        committed = []
+        for (author_name, author_email), drops in by_author.items():
+            if len(drops) == 1:
+                message = drops[0].commit_message
+            else:
+                message = f"Add {len(drops)} agent documents\n\n" + "\n".join(
+                    f"- {d.commit_message}" for d in drops
+                )
+            try:
+                commit_agent_paths(
+                    self.repo_root,
+                    [d.path.relative_to(self.repo_root) for d in drops],
+                    message,
+                    author_name=author_name,
+                    author_email=author_email
+                )
+            except Exception as e:
+                for pending in drops:
+                    try:
+                        pending.path.unlink()
+                    except OSError:
+                        pass  # Best effort cleanup
+                    pending.future.set_exception(RuntimeError(f"Failed to drop off document: {e}"))
+                continue
+            for pending in drops:
+                pending.future.set_result(pending.path)
+            committed.extend(drops)
+
+        if committed:
+            with self._committed:
+                self._committed.notify_all()
+
+        # Keep the search index current, off the callers' critical path
+        try:
+            if committed and get_search_index_path(self.repo_root, self.config).exists():
+                for pending in committed:
+                    index_agent_document(pending.path, pending.content, self.repo_root, self.config)
+        except Exception:
+            pass  # rebuild_search_index() picks the documents up later
+
+    def changes(
+        self,
+        cursor: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        include_content: bool = True,
+        wait: float = 0.0
+    ) -> dict:
+        """
+        Get the documents committed since a cursor, optionally long-polling.
+
+        Args:
+            cursor: Commit SHA from a previous call (None for every document)
+            doc_type: Optional filter by document type
+            include_content: Whether to include each document's content
+            wait: Seconds to block while there are no changes
+
+        Returns:
+            dict: {"cursor": ..., "changes": [...]} as returned by changes_since()
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            batch = changes_since(cursor, doc_type, include_content, self.repo_root, self.config)
+            remaining = deadline - time.monotonic()
+            if batch["changes"] or remaining <= 0:
+                return batch
+            cursor = batch["cursor"]
+            # Woken by our own commits; the timeout catches commits made elsewhere
+            with self._committed:
+                self._committed.wait(min(remaining, CHANGES_POLL_INTERVAL))
+
+    def list(
+        self,
+        doc_type: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        include_archived: bool = True
+    ) -> list:
+        """List documents in the served repository (see list_agent_documents())."""
+        documents = list_agent_documents(doc_type, agent_name, include_archived,
+                                         repo_root=self.repo_root, config=self.config)
+        return [str(path) for path in documents]
+
+    def search(
+        self,
+        query: str,
+        doc_type: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        since: Optional[str] = None,
+        limit: int = 20
+    ) -> list:
+        """Search documents in the served repository (see search_agent_documents())."""
+        return search_agent_documents(query, doc_type, agent_name, since, limit,
+                                      repo_root=self.repo_root, config=self.config)
+
+    def read(self, path: str) -> str:
+        """
+        Read a journal or todo of the served repository.
+
+        Args:
+            path: Document path, absolute or relative to the repository root
+
+        Returns:
+            str: Document content
+
+        Raises:
+            ValueError: If the path is not a document in the journal or todo directory
+            FileNotFoundError: If the document is neither live nor archived
+        """
+        filepath = (self.repo_root / path).resolve()
+        if filepath.parent not in self._document_dirs or filepath.suffix != ".md":
+            raise ValueError(f"Not an agent document: {path}")
+        return read_agent_document(filepath, self.repo_root, self.config)
+
+    def close(self) -> None:
+        """Commit anything still queued and stop the committer."""
+        self._queue.put(None)
+        self._committer.join()
+
+    def handle(self, request: dict):
+        """
+        Execute one protocol request.
+
+        Args:
+            request: Decoded request object with an "op" key
+
+        Returns:
+            The operation's result (JSON-serializable)
+
+        Raises:
+            ValueError: If the operation is unknown
+        """
+        params = dict(request)
+        op = params.pop("op", None)
+        if op == "ping":
+            return "pong"
+        if op == "drop_off":
+            return self.drop_off(**params)
+        if op == "list":
+            return self.list(**params)
+        if op == "search":
+            return self.search(**params)
+        if op == "read":
+            return self.read(**params)
+        if op == "changes":
+            return self.changes(**params)
+        raise ValueError(f"Unknown op: {op}")
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ValueError, OSError):
+                return
+            if request is None:
+                return
+            try:
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                response = {"ok": True, "result": service.handle(request)}
+            except Exception as e:
+                response = {"ok": False, "error": str(e), "type": type(e).__name__}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class DropOffServer(socketserver.ThreadingUnixStreamServer):
+    """Unix-socket server exposing a DropOffService."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: DropOffService):
+        self.service = service
+        self.socket_path = Path(socket_path)
+        if self.socket_path.exists():
+            self.socket_path.unlink()  # Stale socket from a previous run
+        super().__init__(str(self.socket_path), _RequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class DropOffClient:
+    """
+    Minimal client for the drop-off daemon.
+
+    Example:
+        with DropOffClient() as client:
+            client.drop_off("# Journal\\n...", "journal", agent_name="my_agent")
+    """
+
+    def __init__(self, socket_path: Optional[Path] = None):
+        """
+        Args:
+            socket_path: Daemon socket (defaults to DAEMON_SOCKET in the repository root)
+        """
+        self.socket_path = Path(socket_path) if socket_path else default_socket_path()
+        self._sock = None
+
+    def connect(self) -> "DropOffClient":
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(str(self.socket_path))
+        return self
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, op: str, **params):
+        """
+        Send a request and return its result.
+
+        Raises:
+            RuntimeError: If the daemon reports an error or closes the connection
+        """
+        if self._sock is None:
+            self.connect()
+        send_message(self._sock, {"op": op, **params})
+        response = recv_message(self._sock)
+        if response is None:
+            raise RuntimeError("Daemon closed the connection")
+        if not response.get("ok"):
+            raise RuntimeError(f"{response.get('type')}: {response.get('error')}")
+        return response["result"]
+
+    def drop_off(self, content: str, doc_type: str, **params) -> str:
+        return self.request("drop_off", content=content, doc_type=doc_type, **params)["path"]
+
+    def list(self, **params) -> list:
+        return self.request("list", **params)
+
+    def search(self, query: str, **params) -> list:
+        return self.request("search", query=query, **params)
+
+    def changes(self, cursor: Optional[str] = None, **params) -> dict:
+        return self.request("changes", cursor=cursor, **params)
+
+
+def default_socket_path() -> Path:
+    """
+    Get the default daemon socket path.
+
+    Returns:
+        Path: Socket path in the repository root
+    """
+    repo_root = get_repo_root()
+    return repo_root / load_config(repo_root).get('DAEMON_SOCKET', DAEMON_SOCKET)
+
+
+def serve(socket_path: Optional[Path] = None) -> None:
+    """
+    Run the daemon until SIGINT or SIGTERM.
+
+    Args:
+        socket_path: Socket to listen on (defaults to default_socket_path())
+    """
+    repo_root = get_repo_root()
+    os.chdir(repo_root)  # Config and repository lookups resolve from here
+    socket_path = Path(socket_path) if socket_path else default_socket_path()
+
+    service = DropOffService(repo_root)
+    server = DropOffServer(socket_path, service)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"AI agent daemon listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="AI agent drop-off daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="run the daemon")
+    serve_cmd.add_argument("--socket", help="socket path")
+    send_cmd = commands.add_parser("send", help="send one JSON request and print the response")
+    send_cmd.add_argument("request", nargs="?", help="JSON request (read from stdin if omitted)")
+    send_cmd.add_argument("--socket", help="socket path")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.socket)
+        return 0
+
+    request = json.loads(args.request if args.request else sys.stdin.read())
+    with DropOffClient(args.socket) as client:
+        send_message(client._sock, request)
+        response = recv_message(client._sock)
+    print(json.dumps(response, indent=2))
+    return 0 if response and response.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,10 +5,19 @@ This module provides functions for AI agents to drop off their journal entries
 and todo lists to the repository with atomic commit operations (transaction-like behavior).
 """
 
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import re
+import shutil
+import sqlite3
 import subprocess
-from datetime import datetime
-from typing import Optional, Literal
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Literal, Union
 from pathlib import Path
 
 
@@ -18,12 +27,21 @@ AGENT_DOCS_DIR = "ai_agents"
 JOURNAL_DIR = "journals"
 TODO_DIR = "todos"
 TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+SEARCH_INDEX_FILE = ".search_index.db"
+TODO_PRIORITIES = ("high", "medium", "low")
+COLLECTION_DIR = "collection"
+BUNDLE_TEMPLATES_FILE = "agent_bundle_templates.md"
+ARCHIVE_DIR = "archive"
 
 
-def load_config() -> dict:
+def load_config(repo_root: Optional[Path] = None) -> dict:
     """
     Load configuration from .ai_agent_config file.
     
+    Args:
+        repo_root: Optional directory holding the config file (defaults to
+            the current directory)
+        
     Returns:
         dict: Configuration dictionary with key-value pairs
     """
@@ -33,10 +51,14 @@ def load_config() -> dict:
         'JOURNAL_DIR': JOURNAL_DIR,
         'TODO_DIR': TODO_DIR,
         'TIMESTAMP_FORMAT': TIMESTAMP_FORMAT,
+        'SEARCH_INDEX_FILE': SEARCH_INDEX_FILE,
+        'COLLECTION_DIR': COLLECTION_DIR,
+        'BUNDLE_TEMPLATES_FILE': BUNDLE_TEMPLATES_FILE,
+        'ARCHIVE_DIR': ARCHIVE_DIR,
         'AUTO_GIT_ENABLED': 'true'
     }
     
-    config_file = Path('.ai_agent_config')
+    config_file = Path(repo_root or '.') / '.ai_agent_config'
     if config_file.exists():
         with open(config_file, 'r') as f:
             for line in f:
@@ -88,7 +110,8 @@ def validate_document_content(content: str) -> bool:
 def generate_filename(
     doc_type: Literal["journal", "todo"],
     agent_name: str,
-    timestamp: Optional[str] = None
+    timestamp: Optional[str] = None,
+    config: Optional[dict] = None
 ) -> str:
     """
     Generate a filename for an agent document.
@@ -96,20 +119,32 @@ def generate_filename(
     Args:
         doc_type: Type of document ("journal" or "todo")
         agent_name: Name of the agent
-        timestamp: Optional timestamp string (generated if not provided)
+        timestamp: Optional timestamp string in TIMESTAMP_FORMAT (generated
+            if not provided)
+        config: Optional configuration (loaded if not provided)
         
     Returns:
         str: Generated filename
         
     Raises:
-        ValueError: If doc_type is invalid
+        ValueError: If doc_type is invalid or timestamp does not match TIMESTAMP_FORMAT
     """
     if doc_type not in ["journal", "todo"]:
         raise ValueError(f"Invalid doc_type: {doc_type}. Must be 'journal' or 'todo'")
     
-    config = load_config()
+    if config is None:
+        config = load_config()
     if timestamp is None:
         timestamp = datetime.now().strftime(config['TIMESTAMP_FORMAT'])
+    else:
+        # The timestamp becomes part of a path, so only accept well-formed values
+        try:
+            valid = datetime.strptime(timestamp, config['TIMESTAMP_FORMAT']).strftime(
+                config['TIMESTAMP_FORMAT']) == timestamp
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise ValueError(f"Invalid timestamp: {timestamp!r}. Must match {config['TIMESTAMP_FORMAT']}")
     
     # Sanitize agent name (remove special characters)
     safe_agent_name = "".join(c for c in agent_name if c.isalnum() or c in "-_")
@@ -117,10 +152,50 @@ def generate_filename(
     return f"{doc_type}_{timestamp}_{safe_agent_name}.md"
 
 
+def parse_document_filename(filename: str, config: Optional[dict] = None) -> Optional[dict]:
+    """
+    Parse a filename produced by generate_filename().
+    
+    Args:
+        filename: Document filename (e.g. "journal_20250115_120000_agent.md")
+        
+    Returns:
+        Optional[dict]: Dictionary with doc_type, timestamp (datetime, or None if
+            the timestamp does not match TIMESTAMP_FORMAT) and agent_name, or
+            None if the name is not an agent document name
+    """
+    for doc_type in ("journal", "todo"):
+        prefix = f"{doc_type}_"
+        if filename.startswith(prefix) and filename.endswith(".md"):
+            break
+    else:
+        return None
+    
+    if config is None:
+        config = load_config()
+    stem = filename[len(prefix):-len(".md")]
+    width = len(datetime(2000, 1, 1).strftime(config['TIMESTAMP_FORMAT']))
+    if len(stem) <= width or stem[width] != "_":
+        return None
+    
+    try:
+        timestamp = datetime.strptime(stem[:width], config['TIMESTAMP_FORMAT'])
+    except ValueError:
+        timestamp = None
+    
+    return {
+        'doc_type': doc_type,
+        'timestamp': timestamp,
+        'agent_name': stem[width + 1:],
+    }
+
+
 def get_document_path(
     doc_type: Literal["journal", "todo"],
     agent_name: str,
-    timestamp: Optional[str] = None
+    timestamp: Optional[str] = None,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
 ) -> Path:
     """
     Get the full path for an agent document.
@@ -129,15 +204,19 @@ def get_document_path(
         doc_type: Type of document ("journal" or "todo")
         agent_name: Name of the agent
         timestamp: Optional timestamp string
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
         
     Returns:
         Path: Full path to the document
     """
-    config = load_config()
-    repo_root = get_repo_root()
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
     
     subdir = config['JOURNAL_DIR'] if doc_type == "journal" else config['TODO_DIR']
-    filename = generate_filename(doc_type, agent_name, timestamp)
+    filename = generate_filename(doc_type, agent_name, timestamp, config)
     
     return repo_root / config['AGENT_DOCS_DIR'] / subdir / filename
 
@@ -178,20 +257,22 @@ def save_agent_document(
     return filepath
 
 
-def commit_agent_document(
-    filepath: Path,
+def commit_agent_paths(
+    repo_root: Path,
+    relative_paths: list,
     commit_message: str,
     author_name: Optional[str] = None,
     author_email: Optional[str] = None
 ) -> bool:
     """
-    Atomically add and commit an agent document to git (transaction-like operation).
+    Atomically add and commit several paths in one commit (transaction-like operation).
     
-    This function ensures that the document is both added to git and committed
-    in a single operation. If either step fails, the operation is rolled back.
+    Added, modified and deleted paths are all staged. If either the add or the
+    commit fails, the paths are unstaged again.
     
     Args:
-        filepath: Path to the document to commit
+        repo_root: Root of the git repository to commit in
+        relative_paths: Paths relative to repo_root
         commit_message: Commit message
         author_name: Optional git author name
         author_email: Optional git author email
@@ -200,26 +281,22 @@ def commit_agent_document(
         bool: True if successful
         
     Raises:
-        FileNotFoundError: If file doesn't exist
         RuntimeError: If git operations fail
     """
-    if not filepath.exists():
-        raise FileNotFoundError(f"File not found: {filepath}")
-    
-    repo_root = get_repo_root()
-    relative_path = filepath.relative_to(repo_root)
+    pathspecs = "\n".join(Path(p).as_posix() for p in relative_paths)
     
     try:
-        # Step 1: Add the file to git staging area
+        # Step 1: Add the paths to git staging area
         subprocess.run(
-            ['git', 'add', str(relative_path)],
+            ['git', 'add', '--pathspec-from-file=-'],
+            input=pathspecs,
             cwd=repo_root,
             check=True,
             capture_output=True,
             text=True
         )
         
-        # Step 2: Commit the file
+        # Step 2: Commit the paths
         commit_cmd = ['git', 'commit', '-m', commit_message]
         
         # Add author information if provided
@@ -243,13 +320,15 @@ def commit_agent_document(
         return True
         
     except subprocess.CalledProcessError as e:
-        # If commit fails, try to unstage the file
+        # If commit fails, try to unstage the paths
         try:
             subprocess.run(
-                ['git', 'reset', 'HEAD', str(relative_path)],
+                ['git', 'reset', '-q', 'HEAD', '--pathspec-from-file=-'],
+                input=pathspecs,
                 cwd=repo_root,
                 check=False,
-                capture_output=True
+                capture_output=True,
+                text=True
             )
         except:
             pass  # Best effort rollback
@@ -257,6 +336,66 @@ def commit_agent_document(
         raise RuntimeError(f"Git operation failed: {e.stderr}")
 
 
+def commit_agent_document(
+    filepath: Path,
+    commit_message: str,
+    author_name: Optional[str] = None,
+    author_email: Optional[str] = None,
+    repo_root: Optional[Path] = None
+) -> bool:
+    """
+    Atomically add and commit an agent document to git (transaction-like operation).
+    
+    This function ensures that the document is both added to git and committed
+    in a single operation. If either step fails, the operation is rolled back.
+    
+    Args:
+        filepath: Path to the document to commit
+        commit_message: Commit message
+        author_name: Optional git author name
+        author_email: Optional git author email
+        repo_root: Optional repository root (looked up if not provided)
+        
+    Returns:
+        bool: True if successful
+        
+    Raises:
+        FileNotFoundError: If file doesn't exist
+        RuntimeError: If git operations fail
+    """
+    if not filepath.exists():
+        raise FileNotFoundError(f"File not found: {filepath}")
+    
+    if repo_root is None:
+        repo_root = get_repo_root()
+    relative_path = filepath.relative_to(repo_root)
+    
+    return commit_agent_paths(
+        repo_root,
+        [relative_path],
+        commit_message,
+        author_name=author_name,
+        author_email=author_email
+    )
+
+
+def default_commit_message(doc_type: Literal["journal", "todo"], agent_name: str) -> str:
+    """
+    Generate the default commit message for a dropped-off document.
+    
+    Args:
+        doc_type: Type of document ("journal" or "todo")
+        agent_name: Name of the agent
+        
+    Returns:
+        str: Commit message
+    """
+    timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if doc_type == "journal":
+        return f"Add journal entry from {agent_name} - {timestamp_str}"
+    return f"Add todo list from {agent_name} - {timestamp_str}"
+
+
 def drop_off_document(
     content: str,
     doc_type: Literal["journal", "todo"],
@@ -288,22 +427,20 @@ def drop_off_document(
         ValueError: If content or parameters are invalid
         RuntimeError: If save or commit operations fail
     """
-    config = load_config()
+    # Look the repository and its config up once for every step below
+    repo_root = get_repo_root()
+    config = load_config(repo_root)
     
     # Use default agent name if not provided
     if agent_name is None:
         agent_name = config['DEFAULT_AGENT_NAME']
     
     # Generate filepath
-    filepath = get_document_path(doc_type, agent_name, timestamp)
+    filepath = get_document_path(doc_type, agent_name, timestamp, repo_root, config)
     
     # Generate commit message if not provided
     if commit_message is None:
-        timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if doc_type == "journal":
-            commit_message = f"Add journal entry from {agent_name} - {timestamp_str}"
-        else:
-            commit_message = f"Add todo list from {agent_name} - {timestamp_str}"
+        commit_message = default_commit_message(doc_type, agent_name)
     
     try:
         # Step 1: Save the document
@@ -314,11 +451,10 @@ def drop_off_document(
             filepath,
             commit_message,
             author_name=author_name,
-            author_email=author_email
+            author_email=author_email,
+            repo_root=repo_root
         )
         
-        return filepath
-        
     except Exception as e:
         # If anything fails, try to clean up the file
         if filepath.exists():
@@ -328,47 +464,74 @@ def drop_off_document(
                 pass  # Best effort cleanup
         
         raise RuntimeError(f"Failed to drop off document: {str(e)}")
+    
+    # Step 3: Keep the search index current (it is a cache, so never fail the drop)
+    try:
+        if get_search_index_path(repo_root, config).exists():
+            index_agent_document(filepath, content, repo_root, config)
+    except Exception:
+        pass  # rebuild_search_index() picks the document up later
+    
+    return filepath
 
 
 def list_agent_documents(
     doc_type: Optional[Literal["journal", "todo"]] = None,
-    agent_name: Optional[str] = None
+    agent_name: Optional[str] = None,
+    include_archived: bool = True,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
 ) -> list[Path]:
     """
     List existing agent documents.
     
+    Documents rolled into archives by compact_agent_documents() are listed
+    under their original paths; use read_agent_document() to read them.
+    
     Args:
         doc_type: Optional filter by document type
         agent_name: Optional filter by agent name
+        include_archived: Whether to include archived documents
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
         
     Returns:
         list[Path]: List of document paths
     """
-    config = load_config()
-    repo_root = get_repo_root()
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
     agent_docs_dir = repo_root / config['AGENT_DOCS_DIR']
     
     documents = []
     
     # Determine which directories to search
     if doc_type == "journal":
-        search_dirs = [agent_docs_dir / config['JOURNAL_DIR']]
+        subdirs = [config['JOURNAL_DIR']]
     elif doc_type == "todo":
-        search_dirs = [agent_docs_dir / config['TODO_DIR']]
+        subdirs = [config['TODO_DIR']]
     else:
-        search_dirs = [
-            agent_docs_dir / config['JOURNAL_DIR'],
-            agent_docs_dir / config['TODO_DIR']
-        ]
+        subdirs = [config['JOURNAL_DIR'], config['TODO_DIR']]
     
     # Find all markdown files
-    for search_dir in search_dirs:
+    for subdir in subdirs:
+        search_dir = agent_docs_dir / subdir
         if search_dir.exists():
             for filepath in search_dir.glob("*.md"):
                 # Filter by agent name if specified
                 if agent_name is None or f"_{agent_name}.md" in filepath.name:
                     documents.append(filepath)
     
+    # Add archived documents that are not also live
+    if include_archived:
+        live = {filepath.name for filepath in documents}
+        for subdir in subdirs:
+            for idx_path in sorted((agent_docs_dir / config['ARCHIVE_DIR'] / subdir).glob("*.idx.json")):
+                for filename in _load_archive_index(idx_path):
+                    if filename not in live and (agent_name is None or f"_{agent_name}.md" in filename):
+                        documents.append(agent_docs_dir / subdir / filename)
+    
     return sorted(documents)
 
 
@@ -426,3 +589,1230 @@ def drop_off_todo(
         commit_message=commit_message,
         **kwargs
     )
+
+
+# Full-text search over agent documents
+
+def get_search_index_path(repo_root: Optional[Path] = None, config: Optional[dict] = None) -> Path:
+    """
+    Get the path of the full-text search index database.
+    
+    The index is a local cache derived from the documents; it is not committed.
+    
+    Args:
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
+        
+    Returns:
+        Path: Path to the SQLite index file
+    """
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
+    return Path(repo_root) / config['AGENT_DOCS_DIR'] / config['SEARCH_INDEX_FILE']
+
+
+def _open_search_index(repo_root: Optional[Path] = None, config: Optional[dict] = None) -> sqlite3.Connection:
+    """Open (and create if needed) the search index database."""
+    index_path = get_search_index_path(repo_root, config)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(index_path, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            content_hash TEXT NOT NULL,
+            doc_type TEXT,
+            agent_name TEXT,
+            timestamp TEXT,
+            mtime_ns INTEGER,
+            size INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS docs_doc_type ON docs (doc_type);
+        CREATE INDEX IF NOT EXISTS docs_agent_name ON docs (agent_name);
+        CREATE INDEX IF NOT EXISTS docs_timestamp ON docs (timestamp);
+        CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5 (content, tokenize = 'unicode61');
+    """)
+    return conn
+
+
+def _content_hash(content: str) -> str:
+    """Return the SHA-256 hex digest of document content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _index_document(
+    conn: sqlite3.Connection,
+    relative_path: str,
+    content: str,
+    stat: Optional[os.stat_result] = None,
+    config: Optional[dict] = None
+) -> bool:
+    """Index one document on an open connection; return False if it was unchanged."""
+    content_hash = _content_hash(content)
+    mtime_ns = stat.st_mtime_ns if stat else None
+    size = stat.st_size if stat else None
+    
+    row = conn.execute(
+        "SELECT id, content_hash FROM docs WHERE path = ?", (relative_path,)
+    ).fetchone()
+    if row and row[1] == content_hash:
+        conn.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?", (mtime_ns, size, row[0]))
+        return False
+    
+    meta = parse_document_filename(Path(relative_path).name, config) or {}
+    timestamp = meta.get('timestamp')
+    values = (
+        content_hash,
+        meta.get('doc_type'),
+        meta.get('agent_name'),
+        timestamp.isoformat() if timestamp else None,
+        mtime_ns,
+        size,
+    )
+    
+    if row:
+        doc_id = row[0]
+        conn.execute(
+            "UPDATE docs SET content_hash = ?, doc_type = ?, agent_name = ?, timestamp = ?, "
+            "mtime_ns = ?, size = ? WHERE id = ?",
+            values + (doc_id,)
+        )
+        conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+    else:
+        doc_id = conn.execute(
+            "INSERT INTO docs (path, content_hash, doc_type, agent_name, timestamp, mtime_ns, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (relative_path,) + values
+        ).lastrowid
+    conn.execute("INSERT INTO docs_fts (rowid, content) VALUES (?, ?)", (doc_id, content))
+    return True
+
+
+def index_agent_document(
+    filepath: Path,
+    content: Optional[str] = None,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+) -> bool:
+    """
+    Add or update a single document in the search index.
+    
+    Args:
+        filepath: Path to the document
+        content: Document content (read from filepath if not provided)
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
+        
+    Returns:
+        bool: True if the document was (re)indexed, False if its content hash
+            was already indexed
+    """
+    if config is None:
+        config = load_config(repo_root)
+    repo_root = Path(repo_root or get_repo_root()).resolve()
+    filepath = Path(filepath).resolve()
+    if content is None:
+        content = filepath.read_text()
+    
+    conn = _open_search_index(repo_root, config)
+    try:
+        with conn:
+            return _index_document(
+                conn, filepath.relative_to(repo_root).as_posix(), content, filepath.stat(), config
+            )
+    finally:
+        conn.close()
+
+
+def rebuild_search_index(repo_root: Optional[Path] = None, config: Optional[dict] = None) -> dict:
+    """
+    Bring the search index up to date with the documents on disk.
+    
+    Files whose size and modification time match the index are skipped without
+    being read; files that were touched are re-read but only re-indexed when
+    their content hash changed. Archived documents are skipped when the hash in
+    their archive index matches. Documents that no longer exist are removed.
+    
+    Args:
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
+        
+    Returns:
+        dict: Counts of 'indexed', 'unchanged' and 'removed' documents
+    """
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
+    counts = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+    
+    conn = _open_search_index(repo_root, config)
+    try:
+        with conn:
+            known = {
+                path: (mtime_ns, size, content_hash)
+                for path, mtime_ns, size, content_hash
+                in conn.execute("SELECT path, mtime_ns, size, content_hash FROM docs")
+            }
+            
+            for filepath in list_agent_documents(repo_root=repo_root, config=config):
+                relative_path = filepath.relative_to(repo_root).as_posix()
+                previous = known.pop(relative_path, None)
+                if filepath.exists():
+                    stat = filepath.stat()
+                    if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                        counts['unchanged'] += 1
+                        continue
+                    content = filepath.read_text()
+                else:
+                    # Archived documents carry their content hash in the offset index
+                    stat = None
+                    entry = _archived_entry(repo_root, filepath.name, config)
+                    if previous and entry and previous[2] == entry[2]:
+                        counts['unchanged'] += 1
+                        continue
+                    content = read_agent_document(filepath, repo_root, config)
+                if _index_document(conn, relative_path, content, stat, config):
+                    counts['indexed'] += 1
+                else:
+                    counts['unchanged'] += 1
+            
+            for relative_path in known:
+                (doc_id,) = conn.execute("SELECT id FROM docs WHERE path = ?", (relative_path,)).fetchone()
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+                conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+                counts['removed'] += 1
+    finally:
+        conn.close()
+    
+    return counts
+
+
+def search_agent_documents(
+    query: str,
+    doc_type: Optional[Literal["journal", "todo"]] = None,
+    agent_name: Optional[str] = None,
+    since: Optional[Union[datetime, str]] = None,
+    limit: int = 20,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+) -> list[dict]:
+    """
+    Search agent documents by content, best matches first.
+    
+    All words in the query must appear in a document for it to match. The
+    index is built on first use and kept current by drop_off_document(); call
+    rebuild_search_index() after editing documents by other means.
+    
+    Args:
+        query: Words to search for
+        doc_type: Optional filter by document type
+        agent_name: Optional filter by agent name
+        since: Optional lower bound on the document timestamp (datetime, ISO
+            8601 string, or a string in TIMESTAMP_FORMAT)
+        limit: Maximum number of results
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
+        
+    Returns:
+        list[dict]: Results with 'path', 'doc_type', 'agent_name', 'timestamp',
+            'score' (higher is better) and 'snippet' keys
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
+    
+    if isinstance(since, str):
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            since = datetime.strptime(since, config['TIMESTAMP_FORMAT'])
+    
+    if not get_search_index_path(repo_root, config).exists():
+        rebuild_search_index(repo_root, config)
+    
+    sql = (
+        "SELECT docs.path, docs.doc_type, docs.agent_name, docs.timestamp, bm25(docs_fts), "
+        "snippet(docs_fts, 0, '[', ']', '...', 12) "
+        "FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid WHERE docs_fts MATCH ?"
+    )
+    params = [" ".join('"' + term.replace('"', '""') + '"' for term in terms)]
+    if doc_type is not None:
+        sql += " AND docs.doc_type = ?"
+        params.append(doc_type)
+    if agent_name is not None:
+        sql += " AND docs.agent_name = ?"
+        params.append(agent_name)
+    if since is not None:
+        sql += " AND docs.timestamp >= ?"
+        params.append(since.isoformat())
+    sql += " ORDER BY bm25(docs_fts) LIMIT ?"
+    params.append(limit)
+    
+    conn = _open_search_index(repo_root, config)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    
+    return [
+        {
+            'path': Path(repo_root) / path,
+            'doc_type': row_doc_type,
+            'agent_name': row_agent_name,
+            'timestamp': datetime.fromisoformat(timestamp) if timestamp else None,
+            'score': -rank,
+            'snippet': snippet,
+        }
+        for path, row_doc_type, row_agent_name, timestamp, rank, snippet in rows
+    ]
+
+
+# Structured todo items
+
+_TODO_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+_TODO_ITEM_RE = re.compile(r"^\s*[-*+]\s+\[([ xX])\]\s+(.*?)\s*$")
+_TODO_PRIORITY_RE = re.compile(r"\b(" + "|".join(TODO_PRIORITIES) + r")\b(?=\s+priority)")
+
+# Parsed todo files: path -> (mtime_ns, size, content hash, items, cached_at_ns)
+_todo_cache: dict = {}
+
+# Files modified this close to being cached are re-hashed, since a second
+# write within the filesystem's timestamp granularity can keep size and mtime
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class TodoItem:
+    """
+    A single checkbox item from an agent todo list.
+    
+    Attributes:
+        text: Item text with markdown bold markers removed
+        status: "open" for "- [ ]" items, "done" for "- [x]" items
+        priority: "high", "medium" or "low" from the enclosing headings, or None
+        section: Text of the nearest heading above the item
+        agent_name: Agent that owns the todo list
+        path: Path to the todo file
+        line: 1-based line number of the item
+    """
+    
+    __slots__ = ("text", "status", "priority", "section", "agent_name", "path", "line")
+    
+    def __init__(
+        self,
+        text: str,
+        status: Literal["open", "done"],
+        priority: Optional[str],
+        section: Optional[str],
+        agent_name: Optional[str],
+        path: Optional[Path],
+        line: int
+    ):
+        self.text = text
+        self.status = status
+        self.priority = priority
+        self.section = section
+        self.agent_name = agent_name
+        self.path = path
+        self.line = line
+    
+    def __repr__(self) -> str:
+        return (
+            f"TodoItem({self.text!r}, status={self.status!r}, priority={self.priority!r}, "
+            f"agent_name={self.agent_name!r})"
+        )
+
+
+def parse_todo_markdown(
+    text: str,
+    agent_name: Optional[str] = None,
+    path: Optional[Path] = None
+) -> list[TodoItem]:
+    """
+    Parse todo list markdown into TodoItem objects.
+    
+    Every "- [ ]" / "- [x]" line becomes an item. Its priority comes from the
+    nearest enclosing heading that names one ("## High Priority Tasks", ...),
+    so sub-headings inherit their parent's priority; items under other
+    headings (e.g. "Completed Tasks") have no priority.
+    
+    Args:
+        text: Todo list markdown
+        agent_name: Agent name to attach to the items
+        path: Source path to attach to the items
+        
+    Returns:
+        list[TodoItem]: Items in document order
+    """
+    items = []
+    section = None
+    priority = None
+    # (heading level, priority) of the enclosing headings
+    headings = []
+    
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        heading = _TODO_HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            section = heading.group(2)
+            match = _TODO_PRIORITY_RE.search(section.lower())
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            parent = headings[-1][1] if headings else None
+            priority = match.group(1) if match else parent
+            headings.append((level, priority))
+            continue
+        
+        item = _TODO_ITEM_RE.match(line)
+        if item:
+            items.append(TodoItem(
+                text=item.group(2).replace("**", ""),
+                status="open" if item.group(1) == " " else "done",
+                priority=priority,
+                section=section,
+                agent_name=agent_name,
+                path=path,
+                line=line_number,
+            ))
+    
+    return items
+
+
+def load_todo_items(filepath: Path) -> list[TodoItem]:
+    """
+    Parse a todo file, reusing the previous parse if the file is unchanged.
+    
+    A file is re-read only when its size or modification time changed, and
+    re-parsed only when its content hash changed. Archived todo lists are
+    re-read only when the hash in their archive index changed.
+    
+    Args:
+        filepath: Path to the todo file (live or archived)
+        
+    Returns:
+        list[TodoItem]: Items in document order
+    """
+    filepath = Path(filepath)
+    cached = _todo_cache.get(filepath)
+    
+    if not filepath.exists():
+        # Archived todo list: the offset index records the content hash
+        entry = _archived_entry(get_repo_root(), filepath.name)
+        if cached and entry and cached[2] == entry[2]:
+            return cached[3]
+        content = read_agent_document(filepath)
+        meta = parse_document_filename(filepath.name) or {}
+        items = parse_todo_markdown(content, agent_name=meta.get('agent_name'), path=filepath)
+        _todo_cache[filepath] = (None, None, _content_hash(content), items, time.time_ns())
+        return items
+    
+    stat = filepath.stat()
+    if (cached and cached[:2] == (stat.st_mtime_ns, stat.st_size)
+            and stat.st_mtime_ns < cached[4] - _RACY_WINDOW_NS):
+        return cached[3]
+    
+    content = filepath.read_text()
+    content_hash = _content_hash(content)
+    if cached and cached[2] == content_hash:
+        items = cached[3]
+    else:
+        meta = parse_document_filename(filepath.name) or {}
+        items = parse_todo_markdown(content, agent_name=meta.get('agent_name'), path=filepath)
+    
+    _todo_cache[filepath] = (stat.st_mtime_ns, stat.st_size, content_hash, items, time.time_ns())
+    return items
+
+
+def _latest_todo_files(paths: list[Path]) -> list[Path]:
+    """Keep only the most recent todo file for each agent."""
+    latest = {}
+    for path in paths:
+        meta = parse_document_filename(path.name) or {}
+        key = meta.get('agent_name')
+        stamp = meta.get('timestamp') or datetime.min
+        if key not in latest or stamp >= latest[key][0]:
+            latest[key] = (stamp, path)
+    return sorted(path for _, path in latest.values())
+
+
+def query_todo_items(
+    status: Optional[Literal["open", "done"]] = None,
+    priority: Optional[str] = None,
+    agent_name: Optional[str] = None,
+    latest_only: bool = False
+) -> list[TodoItem]:
+    """
+    Query todo items across all agent todo lists.
+    
+    Args:
+        status: Optional filter, "open" or "done"
+        priority: Optional filter, "high", "medium" or "low"
+        agent_name: Optional filter by agent name
+        latest_only: Only read each agent's most recent todo list
+        
+    Returns:
+        list[TodoItem]: Matching items, ordered by file then line
+    """
+    paths = list_agent_documents(doc_type="todo", agent_name=agent_name)
+    if latest_only:
+        paths = _latest_todo_files(paths)
+    
+    return [
+        item
+        for path in paths
+        for item in load_todo_items(path)
+        if (status is None or item.status == status)
+        and (priority is None or item.priority == priority)
+        and (agent_name is None or item.agent_name == agent_name)
+    ]
+
+
+def count_todo_items(
+    group_by: Literal["agent_name", "priority", "status", "section"] = "agent_name",
+    **filters
+) -> dict:
+    """
+    Count todo items across all agent todo lists.
+    
+    Args:
+        group_by: TodoItem attribute to group counts by
+        **filters: Filters passed to query_todo_items()
+        
+    Returns:
+        dict: Item count per group value
+    """
+    if group_by not in ("agent_name", "priority", "status", "section"):
+        raise ValueError(f"Invalid group_by: {group_by}")
+    
+    counts = {}
+    for item in query_todo_items(**filters):
+        key = getattr(item, group_by)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+# Agent bundles
+
+_BUNDLE_SECTION_RE = re.compile(r"^## \d+\.\s.*?`([^`]+)`")
+_BUNDLE_PLACEHOLDER_RE = re.compile(r"\{\{(GENERATE_UUID|GUID|TIMESTAMP)\}\}")
+
+# Compiled templates: templates file -> (mtime_ns, [(filename, parts), ...])
+_bundle_template_cache: dict = {}
+
+
+def _placeholder_kind(name: str, line: str) -> str:
+    """Decide what a placeholder on a template line stands for."""
+    if name == "TIMESTAMP":
+        return "timestamp"
+    if name == "GUID":
+        return "todo_id"
+    lowered = line.lower()
+    if lowered.lstrip("# ").startswith("todo:"):
+        return "todo_id"
+    if "bundle id" in lowered or "bundle_id" in lowered:
+        return "bundle_id"
+    if "session id" in lowered or "session_id" in lowered:
+        return "session_id"
+    return "uuid"
+
+
+def _compile_bundle_template(body: str) -> tuple:
+    """Split a template into literal text and placeholder kinds."""
+    parts = []
+    literal = []
+    for line in body.splitlines(keepends=True):
+        position = 0
+        for match in _BUNDLE_PLACEHOLDER_RE.finditer(line):
+            literal.append(line[position:match.start()])
+            parts.append("".join(literal))
+            parts.append(_placeholder_kind(match.group(1), line))
+            literal = []
+            position = match.end()
+        literal.append(line[position:])
+    parts.append("".join(literal))
+    # Even indexes are literal text, odd indexes are placeholder kinds
+    return tuple(parts)
+
+
+def load_bundle_templates(templates_file: Optional[Path] = None) -> list[tuple]:
+    """
+    Extract and pre-compile the bundle file templates.
+    
+    Each "## N. `filename`" section of the templates document contributes the
+    first fenced code block that follows it. Results are cached until the
+    templates file changes.
+    
+    Args:
+        templates_file: Path to the templates document (defaults to
+            BUNDLE_TEMPLATES_FILE in the repository root)
+        
+    Returns:
+        list[tuple]: (filename, compiled template) pairs in document order
+        
+    Raises:
+        FileNotFoundError: If the templates file doesn't exist
+        ValueError: If no templates are found
+    """
+    if templates_file is None:
+        templates_file = get_repo_root() / load_config()['BUNDLE_TEMPLATES_FILE']
+    templates_file = Path(templates_file)
+    
+    mtime_ns = templates_file.stat().st_mtime_ns
+    cached = _bundle_template_cache.get(templates_file)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    
+    templates = []
+    filename = None
+    body = None
+    depth = 0
+    for line in templates_file.read_text().splitlines(keepends=True):
+        fence = line.strip()
+        if body is not None:
+            if fence.startswith("```"):
+                # Bare fences close a block, fences with a language open a nested one
+                depth += 1 if fence != "```" else -1
+                if depth == 0:
+                    templates.append((filename, _compile_bundle_template("".join(body))))
+                    filename, body = None, None
+                    continue
+            body.append(line)
+        elif fence.startswith("```") and filename is not None:
+            body, depth = [], 1
+        else:
+            section = _BUNDLE_SECTION_RE.match(line)
+            if section:
+                filename = section.group(1)
+    
+    if not templates:
+        raise ValueError(f"No bundle templates found in {templates_file}")
+    
+    _bundle_template_cache[templates_file] = (mtime_ns, templates)
+    return templates
+
+
+def render_bundle_template(compiled: tuple, values: dict) -> str:
+    """
+    Render a compiled bundle template.
+    
+    Args:
+        compiled: Template compiled by load_bundle_templates()
+        values: Values for 'bundle_id', 'session_id', 'todo_id' and
+            'timestamp'; every other {{GENERATE_UUID}} gets a fresh UUID
+        
+    Returns:
+        str: Rendered file content
+    """
+    out = []
+    for index, part in enumerate(compiled):
+        if index % 2 == 0:
+            out.append(part)
+        elif part == "uuid":
+            out.append(str(uuid.uuid4()))
+        else:
+            out.append(values[part])
+    return "".join(out)
+
+
+def _is_repository_root(path: Path) -> bool:
+    """Return True if path is the top level of its own git repository."""
+    result = subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel'],
+        cwd=path,
+        capture_output=True,
+        text=True
+    )
+    return result.returncode == 0 and Path(result.stdout.strip()).resolve() == path.resolve()
+
+
+def create_agent_bundles(
+    n: int,
+    collection_dir: Optional[Path] = None,
+    templates_file: Optional[Path] = None,
+    include_manifest: bool = True,
+    commit_message: Optional[str] = None,
+    author_name: Optional[str] = None,
+    author_email: Optional[str] = None
+) -> list[Path]:
+    """
+    Create n agent bundles and commit them as one batch.
+    
+    Templates are compiled once and rendered in memory. Each bundle is written
+    to collection/agent_bundle_<UUID>/. When the collection directory is a
+    git submodule, the bundles are committed in the submodule and the
+    submodule pointer is updated in the main repository, once per batch.
+    Otherwise they are committed in the main repository. If anything fails,
+    the created bundles are removed again.
+    
+    Args:
+        n: Number of bundles to create
+        collection_dir: Collection directory (defaults to COLLECTION_DIR in the
+            repository root)
+        templates_file: Templates document (defaults to BUNDLE_TEMPLATES_FILE)
+        include_manifest: Whether to write bundle.json
+        commit_message: Commit message for the bundles (generated if not provided)
+        author_name: Optional git author name
+        author_email: Optional git author email
+        
+    Returns:
+        list[Path]: Paths to the created bundle directories
+        
+    Raises:
+        ValueError: If n is not positive or no templates are found
+        RuntimeError: If writing or committing the bundles fails
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    
+    config = load_config()
+    repo_root = get_repo_root()
+    if collection_dir is None:
+        collection_dir = repo_root / config['COLLECTION_DIR']
+    collection_dir = Path(collection_dir)
+    
+    templates = load_bundle_templates(templates_file)
+    if not include_manifest:
+        templates = [(name, compiled) for name, compiled in templates if name != "bundle.json"]
+    
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if commit_message is None:
+        commit_message = f"Add {n} agent bundle{'s' if n != 1 else ''}"
+    
+    collection_dir.mkdir(parents=True, exist_ok=True)
+    is_submodule = collection_dir.resolve() != repo_root.resolve() and _is_repository_root(collection_dir)
+    commit_root = collection_dir if is_submodule else repo_root
+    
+    bundle_dirs = []
+    committed_in_submodule = False
+    try:
+        # Step 1: Render and write every bundle
+        for _ in range(n):
+            values = {
+                'bundle_id': str(uuid.uuid4()),
+                'session_id': str(uuid.uuid4()),
+                'todo_id': str(uuid.uuid4()),
+                'timestamp': timestamp,
+            }
+            bundle_dir = collection_dir / f"agent_bundle_{values['bundle_id']}"
+            bundle_dir.mkdir()
+            bundle_dirs.append(bundle_dir)
+            for filename, compiled in templates:
+                (bundle_dir / filename).write_text(render_bundle_template(compiled, values))
+        
+        # Step 2: Commit the batch
+        commit_agent_paths(
+            commit_root,
+            [d.resolve().relative_to(commit_root.resolve()) for d in bundle_dirs],
+            commit_message,
+            author_name=author_name,
+            author_email=author_email
+        )
+        
+        # Step 3: Point the main repository at the new submodule commit
+        if is_submodule:
+            committed_in_submodule = True
+            commit_agent_paths(
+                repo_root,
+                [collection_dir.resolve().relative_to(repo_root.resolve())],
+                f"Update collection submodule ({commit_message})",
+                author_name=author_name,
+                author_email=author_email
+            )
+        
+        return bundle_dirs
+        
+    except Exception as e:
+        # Roll back: drop the submodule commit and remove the written bundles
+        if committed_in_submodule:
+            subprocess.run(
+                ['git', 'reset', '-q', 'HEAD~1'],
+                cwd=collection_dir,
+                check=False,
+                capture_output=True
+            )
+        for bundle_dir in bundle_dirs:
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+        
+        raise RuntimeError(f"Failed to create agent bundles: {str(e)}")
+
+
+# Archive compaction
+
+ARCHIVE_PACK_SUFFIX = ".pack"
+ARCHIVE_INDEX_SUFFIX = ".idx.json"
+
+# Loaded archive indexes: index path -> (mtime_ns, {filename: [offset, length, sha256]})
+_archive_index_cache: dict = {}
+
+
+def _load_archive_index(idx_path: Path) -> dict:
+    """Load an archive offset index, reusing the cached copy if unchanged."""
+    try:
+        mtime_ns = idx_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _archive_index_cache.get(idx_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    
+    entries = json.loads(idx_path.read_text())
+    _archive_index_cache[idx_path] = (mtime_ns, entries)
+    return entries
+
+
+def _archive_location(filename: str, config: Optional[dict] = None) -> Optional[tuple]:
+    """Return (subdir, month) of the archive a document belongs to, if any."""
+    if config is None:
+        config = load_config()
+    meta = parse_document_filename(filename, config)
+    if meta is None or meta['timestamp'] is None:
+        return None
+    subdir = config['JOURNAL_DIR'] if meta['doc_type'] == "journal" else config['TODO_DIR']
+    return subdir, meta['timestamp'].strftime("%Y-%m")
+
+
+def _archive_paths(
+    repo_root: Path,
+    subdir: str,
+    month: str,
+    config: Optional[dict] = None
+) -> tuple[Path, Path]:
+    """Return the pack and index paths for one month of one document type."""
+    if config is None:
+        config = load_config()
+    archive_dir = repo_root / config['AGENT_DOCS_DIR'] / config['ARCHIVE_DIR'] / subdir
+    return archive_dir / f"{month}{ARCHIVE_PACK_SUFFIX}", archive_dir / f"{month}{ARCHIVE_INDEX_SUFFIX}"
+
+
+def _archived_entry(repo_root: Path, filename: str, config: Optional[dict] = None) -> Optional[list]:
+    """Return the [offset, length, sha256] archive index entry for a document."""
+    location = _archive_location(filename, config)
+    if location is None:
+        return None
+    _, idx_path = _archive_paths(repo_root, *location, config)
+    return _load_archive_index(idx_path).get(filename)
+
+
+def read_agent_document(
+    filepath: Union[Path, str],
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+) -> str:
+    """
+    Read an agent document, whether it is live or archived.
+    
+    Args:
+        filepath: Document path as returned by list_agent_documents()
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded if not provided)
+        
+    Returns:
+        str: Document content
+        
+    Raises:
+        FileNotFoundError: If the document is neither live nor archived
+    """
+    filepath = Path(filepath)
+    if filepath.exists():
+        return filepath.read_text()
+    
+    if config is None:
+        config = load_config(repo_root)
+    if repo_root is None:
+        repo_root = get_repo_root()
+    entry = _archived_entry(repo_root, filepath.name, config)
+    if entry is not None:
+        pack_path, _ = _archive_paths(repo_root, *_archive_location(filepath.name, config), config)
+        offset, length, _ = entry
+        with open(pack_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length).decode("utf-8")
+    
+    raise FileNotFoundError(f"Document not found: {filepath}")
+
+
+def compact_agent_documents(
+    before: Union[datetime, str],
+    doc_type: Optional[Literal["journal", "todo"]] = "journal",
+    commit_message: Optional[str] = None,
+    author_name: Optional[str] = None,
+    author_email: Optional[str] = None
+) -> dict:
+    """
+    Roll live documents older than a cutoff into per-month packed archives.
+    
+    Each month's documents are appended to ai_agents/archive/<subdir>/<YYYY-MM>.pack,
+    and <YYYY-MM>.idx.json maps every filename to its byte offset, length and
+    SHA-256. The originals are deleted, and the packs, indexes and deletions are
+    committed together using the same atomic commit path as drop_off_document().
+    If anything fails, the packs, indexes and originals are restored.
+    
+    Args:
+        before: Archive documents with a filename timestamp earlier than this
+            (datetime, or ISO 8601 string)
+        doc_type: Document type to compact (None compacts both)
+        commit_message: Git commit message (generated if not provided)
+        author_name: Optional git author name
+        author_email: Optional git author email
+        
+    Returns:
+        dict: 'archived' document count and 'packs' (paths to the updated packs)
+        
+    Raises:
+        RuntimeError: If writing or committing the archives fails
+    """
+    if isinstance(before, str):
+        before = datetime.fromisoformat(before)
+    
+    repo_root = get_repo_root()
+    groups = {}
+    for filepath in list_agent_documents(doc_type=doc_type, include_archived=False):
+        meta = parse_document_filename(filepath.name)
+        if meta and meta['timestamp'] and meta['timestamp'] < before:
+            groups.setdefault(_archive_location(filepath.name), []).append(filepath)
+    
+    if not groups:
+        return {'archived': 0, 'packs': []}
+    
+    archived = sum(len(paths) for paths in groups.values())
+    if commit_message is None:
+        commit_message = f"Compact {archived} agent documents older than {before.date().isoformat()} into archives"
+    
+    backups = {}   # pack/index path -> original bytes (None if it did not exist)
+    originals = {} # deleted document path -> original bytes
+    packs = []
+    try:
+        # Step 1: Append documents to the month packs and rewrite their indexes
+        for (subdir, month), paths in sorted(groups.items()):
+            pack_path, idx_path = _archive_paths(repo_root, subdir, month)
+            pack_path.parent.mkdir(parents=True, exist_ok=True)
+            for path in (pack_path, idx_path):
+                backups[path] = path.read_bytes() if path.exists() else None
+            
+            entries = dict(_load_archive_index(idx_path))
+            with open(pack_path, 'ab') as pack:
+                for filepath in sorted(paths):
+                    data = filepath.read_bytes()
+                    entries[filepath.name] = [pack.tell(), len(data), hashlib.sha256(data).hexdigest()]
+                    pack.write(data)
+                    originals[filepath] = data
+            
+            tmp_path = idx_path.with_name(idx_path.name + ".tmp")
+            tmp_path.write_text(json.dumps(entries, indent=0, sort_keys=True))
+            tmp_path.replace(idx_path)
+            packs.append(pack_path)
+        
+        # Step 2: Remove the originals
+        for filepath in originals:
+            filepath.unlink()
+        
+        # Step 3: Commit packs, indexes and deletions together
+        commit_agent_paths(
+            repo_root,
+            [p.relative_to(repo_root) for p in list(backups) + list(originals)],
+            commit_message,
+            author_name=author_name,
+            author_email=author_email
+        )
+        
+        return {'archived': archived, 'packs': packs}
+        
+    except Exception as e:
+        # Restore archives and originals to their previous state
+        for path, data in backups.items():
+            try:
+                if data is None:
+                    path.unlink(missing_ok=True)
+                else:
+                    path.write_bytes(data)
+            except OSError:
+                pass  # Best effort rollback
+        for filepath, data in originals.items():
+            try:
+                if not filepath.exists():
+                    filepath.write_bytes(data)
+            except OSError:
+                pass  # Best effort rollback
+        
+        raise RuntimeError(f"Failed to compact agent documents: {str(e)}")
+
+
+# Change feed
+
+def get_head_commit(repo_root: Optional[Path] = None) -> Optional[str]:
+    """
+    Get the commit SHA of HEAD.
+    
+    Args:
+        repo_root: Optional repository root (looked up if not provided)
+        
+    Returns:
+        Optional[str]: Full commit SHA, or None if the repository has no commits
+    """
+    result = subprocess.run(
+        ['git', 'rev-parse', '--verify', '-q', 'HEAD'],
+        cwd=repo_root or get_repo_root(),
+        capture_output=True,
+        text=True
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _read_blobs(repo_root: Path, blob_ids: list) -> dict:
+    """Read several blobs with one git cat-file --batch call; return {blob_id: text}."""
+    if not blob_ids:
+        return {}
+    
+    result = subprocess.run(
+        ['git', 'cat-file', '--batch'],
+        input="".join(f"{blob_id}\n" for blob_id in blob_ids).encode(),
+        cwd=repo_root,
+        check=True,
+        capture_output=True
+    )
+    
+    blobs = {}
+    output = result.stdout
+    pos = 0
+    for blob_id in blob_ids:
+        header_end = output.index(b"\n", pos)
+        size = int(output[pos:header_end].split()[2])
+        start = header_end + 1
+        blobs[blob_id] = output[start:start + size].decode("utf-8")
+        pos = start + size + 1  # Skip the trailing newline
+    return blobs
+
+
+def changes_since(
+    cursor: Optional[str] = None,
+    doc_type: Optional[Literal["journal", "todo"]] = None,
+    include_content: bool = True,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+) -> dict:
+    """
+    Get the agent documents added or modified since a commit.
+    
+    The changes are computed by diffing the cursor commit's tree against
+    HEAD's, and contents are read in one batch from the object store, so the
+    cost scales with the number of changed documents rather than with the
+    size of the repository. Uncommitted files and deletions (including
+    documents moved into archives by compaction) are not reported.
+    
+    Args:
+        cursor: Commit SHA returned by a previous call (None for every
+            document at HEAD)
+        doc_type: Optional filter by document type
+        include_content: Whether to include each document's content
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded from repo_root if not provided)
+        
+    Returns:
+        dict: {"cursor": SHA to pass to the next call, "changes": [change, ...]}
+            where each change has path, status ("added" or "modified"),
+            doc_type, agent_name, timestamp, blob and (optionally) content
+        
+    Raises:
+        ValueError: If the cursor is not a commit in this repository
+        RuntimeError: If git operations fail
+    """
+    if config is None:
+        config = load_config(repo_root)
+    repo_root = repo_root or get_repo_root()
+    head = get_head_commit(repo_root)
+    if head is None or head == cursor:
+        return {"cursor": head or cursor, "changes": []}
+    
+    if doc_type == "journal":
+        subdirs = [config['JOURNAL_DIR']]
+    elif doc_type == "todo":
+        subdirs = [config['TODO_DIR']]
+    else:
+        subdirs = [config['JOURNAL_DIR'], config['TODO_DIR']]
+    pathspecs = [f"{config['AGENT_DOCS_DIR']}/{subdir}/" for subdir in subdirs]
+    
+    entries = []  # (relative path, blob id, status)
+    try:
+        if cursor is None:
+            output = subprocess.run(
+                ['git', 'ls-tree', '-r', '-z', '--full-tree', head, '--'] + pathspecs,
+                cwd=repo_root,
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            for record in output.split("\0"):
+                if record:
+                    info, relative_path = record.split("\t", 1)
+                    entries.append((relative_path, info.split()[2], "added"))
+        else:
+            verified = subprocess.run(
+                ['git', 'rev-parse', '--verify', '-q', f"{cursor}^{{commit}}"],
+                cwd=repo_root,
+                capture_output=True,
+                text=True
+            )
+            if verified.returncode != 0:
+                raise ValueError(f"Unknown cursor commit: {cursor}")
+            
+            output = subprocess.run(
+                ['git', 'diff', '--raw', '-z', '--no-renames', '--no-abbrev', '--diff-filter=AM',
+                 verified.stdout.strip(), head, '--'] + pathspecs,
+                cwd=repo_root,
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            # Records alternate ":<modes> <old blob> <new blob> <status>" and the path
+            fields = output.split("\0")
+            for info, relative_path in zip(fields[0::2], fields[1::2]):
+                _, _, _, blob_id, status = info.split()
+                entries.append((relative_path, blob_id, "added" if status == "A" else "modified"))
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Git operation failed: {e.stderr}")
+    
+    changes = []
+    for relative_path, blob_id, status in sorted(entries):
+        meta = parse_document_filename(Path(relative_path).name, config)
+        if meta is None or not relative_path.endswith(".md"):
+            continue
+        changes.append({
+            "path": str(repo_root / relative_path),
+            "status": status,
+            "doc_type": meta['doc_type'],
+            "agent_name": meta['agent_name'],
+            "timestamp": meta['timestamp'].isoformat() if meta['timestamp'] else None,
+            "blob": blob_id,
+        })
+    
+    if include_content:
+        try:
+            blobs = _read_blobs(repo_root, [change["blob"] for change in changes])
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Git operation failed: {e.stderr}")
+        for change in changes:
+            change["content"] = blobs[change["blob"]]
+    
+    return {"cursor": head, "changes": changes}
+
+
+def follow_changes(
+    cursor: Optional[str] = None,
+    doc_type: Optional[Literal["journal", "todo"]] = None,
+    include_content: bool = True,
+    poll_interval: float = 1.0,
+    timeout: Optional[float] = None,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+):
+    """
+    Follow new agent documents, yielding each non-empty changes_since() batch.
+    
+    Polling only resolves HEAD until a new commit appears. Save each batch's
+    cursor after processing it to resume from there later.
+    
+    Args:
+        cursor: Commit SHA to start after (None to start with every document)
+        doc_type: Optional filter by document type
+        include_content: Whether to include each document's content
+        poll_interval: Seconds between checks for new commits
+        timeout: Stop following after this many seconds (None to follow forever)
+        repo_root: Optional repository root (looked up if not provided)
+        config: Optional configuration (loaded from repo_root if not provided)
+        
+    Yields:
+        dict: {"cursor": ..., "changes": [...]} as returned by changes_since()
+    """
+    if config is None:
+        config = load_config(repo_root)
+    repo_root = repo_root or get_repo_root()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    
+    while True:
+        batch = changes_since(cursor, doc_type, include_content, repo_root, config)
+        cursor = batch["cursor"]
+        if batch["changes"]:
+            yield batch
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        time.sleep(poll_interval)
+
+
+async def follow_changes_async(
+    cursor: Optional[str] = None,
+    doc_type: Optional[Literal["journal", "todo"]] = None,
+    include_content: bool = True,
+    poll_interval: float = 1.0,
+    timeout: Optional[float] = None,
+    repo_root: Optional[Path] = None,
+    config: Optional[dict] = None
+):
+    """
+    Asynchronous version of follow_changes(); git runs in a worker thread.
+    
+    Yields:
+        dict: {"cursor": ..., "changes": [...]} as returned by changes_since()
+    """
+    if config is None:
+        config = load_config(repo_root)
+    repo_root = repo_root or await asyncio.to_thread(get_repo_root)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    
+    while True:
+        batch = await asyncio.to_thread(changes_since, cursor, doc_type, include_content, repo_root, config)
+        cursor = batch["cursor"]
+        if batch["changes"]:
+            yield batch
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(poll_interval)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command-line entry point for maintenance tasks.
+    
+    Usage:
+        python ai_agent_utils.py compact --before 2025-01-01 [--doc-type journal|todo|all]
+        python ai_agent_utils.py changes [--since SHA] [--doc-type journal|todo|all] [--follow]
+    """
+    parser = argparse.ArgumentParser(description="AI agent document maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser("compact", help="roll old documents into monthly archives")
+    compact.add_argument("--before", required=True, help="archive documents older than this ISO date")
+    compact.add_argument("--doc-type", choices=["journal", "todo", "all"], default="journal")
+    changes = commands.add_parser("changes", help="print documents added or modified since a commit as JSON lines")
+    changes.add_argument("--since", help="cursor commit SHA (default: every document)")
+    changes.add_argument("--doc-type", choices=["journal", "todo", "all"], default="all")
+    changes.add_argument("--follow", action="store_true", help="keep printing new documents as they are committed")
+    changes.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    
+    if args.command == "compact":
+        result = compact_agent_documents(
+            args.before,
+            doc_type=None if args.doc_type == "all" else args.doc_type
+        )
+        print(f"Archived {result['archived']} documents into {len(result['packs'])} packs")
+    elif args.command == "changes":
+        doc_type = None if args.doc_type == "all" else args.doc_type
+        if args.follow:
+            batches = follow_changes(args.since, doc_type, poll_interval=args.poll_interval)
+        else:
+            batches = [changes_since(args.since, doc_type)]
+        for batch in batches:
+            for change in batch["changes"]:
+                print(json.dumps({**change, "cursor": batch["cursor"]}), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
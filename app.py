@@ -1,6 +1,8 @@
 from flask import Flask, request
 from flask_cors import CORS
 import json
+import math
+import time
 
 # Loading environment variables
 import os
@@ -10,11 +12,37 @@ openai_api_key = os.environ.get('openai_api_key')
 cohere_api_key = os.environ.get('cohere_api_key')
 qdrant_url = os.environ.get('qdrant_url')
 qdrant_api_key = os.environ.get('qdrant_api_key')
+qdrant_prefer_grpc = os.environ.get('qdrant_prefer_grpc', 'true').lower() == 'true'
 
 #Flask config
 app = Flask(__name__)
 CORS(app)
 
+# Upstream concurrency and rate limits
+from rag_utils import UpstreamLimiter, UpstreamRejected, DEFAULT_MAX_QUEUE
+
+request_deadline = float(os.environ.get('request_deadline', 30))
+openai_max_retries = int(os.environ.get('openai_max_retries', 2))
+
+def limiter_from_env(name, max_concurrency):
+    return UpstreamLimiter(
+        name,
+        max_concurrency=int(os.environ.get(f'{name}_max_concurrency', max_concurrency)),
+        rate=float(os.environ.get(f'{name}_rate_limit', 0)),
+        burst=int(os.environ.get(f'{name}_burst', 0)),
+        max_queue=int(os.environ.get(f'{name}_max_queue', DEFAULT_MAX_QUEUE)),
+    )
+
+upstreams = {
+    "cohere": limiter_from_env("cohere", 8),
+    "qdrant": limiter_from_env("qdrant", 16),
+    "openai": limiter_from_env("openai", 4),
+}
+
+@app.errorhandler(UpstreamRejected)
+def upstream_rejected(e):
+    return {"error": str(e), "upstream": e.upstream}, e.status, {"Retry-After": str(math.ceil(e.retry_after))}
+
 # Test default route
 @app.route('/')
 def hello_world():
@@ -24,35 +52,162 @@ def hello_world():
 from langchain.embeddings import CohereEmbeddings
 from langchain.document_loaders import PyPDFLoader
 from langchain.vectorstores import Qdrant
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+from hashlib import md5
+from rag_utils import build_collection_config, build_search_params
 
 @app.route('/embed', methods=['POST'])
 def embed_pdf():
     collection_name = request.json.get("collection_name")
     file_url = request.json.get("file_url")
+    deadline = time.monotonic() + request_deadline
+    try:
+        collection_config, payload_indexes = build_collection_config(request.json.get("profile"))
+    except ValueError as e:
+        return {"error": str(e)}, 400
 
     loader = PyPDFLoader(file_url)
     docs = loader.load_and_split()
+    texts = [doc.page_content for doc in docs]
+    metadatas = [doc.metadata for doc in docs]
+
+    # Same steps as Qdrant.from_documents. The Qdrant steps share one slot, so a
+    # rejection can't land between recreating the collection and filling it.
     embeddings = CohereEmbeddings(model="multilingual-22-12", cohere_api_key=cohere_api_key)
-    qdrant = Qdrant.from_documents(docs, embeddings, url=qdrant_url, collection_name=collection_name, prefer_grpc=True, api_key=qdrant_api_key)
-    
-    return {"collection_name":qdrant.collection_name}
+    vectors = upstreams["cohere"].call(embeddings.embed_documents, texts, deadline=deadline)
+
+    client = QdrantClient(url=qdrant_url, prefer_grpc=qdrant_prefer_grpc, api_key=qdrant_api_key)
+    with upstreams["qdrant"].slot(deadline):
+        client.recreate_collection(
+            collection_name=collection_name,
+            vectors_config=rest.VectorParams(size=len(vectors[0]), distance=rest.Distance.COSINE),
+            **collection_config,
+        )
+        for field_name, field_schema in payload_indexes.items():
+            client.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=field_schema)
+        client.upsert(
+            collection_name=collection_name,
+            points=rest.Batch.construct(
+                ids=[md5(text.encode("utf-8")).hexdigest() for text in texts],
+                vectors=vectors,
+                payloads=Qdrant._build_payloads(texts, metadatas, "page_content", "metadata"),
+            ),
+        )
+
+    return {"collection_name":collection_name}
 
 # Retrieve information from a collection
 from langchain.chains.question_answering import load_qa_chain
 from langchain.llms import OpenAI
-from qdrant_client import QdrantClient
+
+from rag_utils import SingleFlight, normalize_query, DEFAULT_SINGLE_FLIGHT_TIMEOUT, positive_int
+
+# Concurrent identical questions share one embedding/search/LLM run
+retrieve_flight = SingleFlight()
+single_flight_timeout = float(os.environ.get('single_flight_timeout', DEFAULT_SINGLE_FLIGHT_TIMEOUT))
+
+def answer_query(collection_name, query, k, search_params, deadline):
+    client = QdrantClient(url=qdrant_url, prefer_grpc=qdrant_prefer_grpc, api_key=qdrant_api_key)
+
+    embeddings = CohereEmbeddings(model="multilingual-22-12", cohere_api_key=cohere_api_key)
+    embedding = upstreams["cohere"].call(embeddings.embed_query, query, deadline=deadline)
+    points = upstreams["qdrant"].call(
+        client.search,
+        collection_name=collection_name,
+        query_vector=embedding,
+        search_params=search_params,
+        with_payload=True,
+        limit=k,
+        deadline=deadline,
+    )
+    search_results = [Qdrant._document_from_scored_point(point, "page_content", "metadata") for point in points]
+
+    llm = OpenAI(
+        openai_api_key=openai_api_key,
+        temperature=0.2,
+        max_retries=openai_max_retries,
+        request_timeout=max(1.0, deadline - time.monotonic()),
+    )
+    chain = load_qa_chain(llm, chain_type="stuff")
+    results = upstreams["openai"].call(chain, {"input_documents": search_results, "question": query}, return_only_outputs=True, deadline=deadline)
+    return results["output_text"]
 
 @app.route('/retrieve', methods=['POST'])
 def retrieve_info():
     collection_name = request.json.get("collection_name")
     query = request.json.get("query")
+    ef = request.json.get("ef")
+    rescore = request.json.get("rescore")
+    deadline = time.monotonic() + request_deadline
+    if not isinstance(collection_name, str) or not collection_name:
+        return {"error": "collection_name must be a non-empty string"}, 400
+    if not isinstance(query, str):
+        return {"error": "query must be a string"}, 400
+    try:
+        k = positive_int("k", request.json.get("k", 2))
+        search_params = build_search_params(ef, rescore)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # ef and rescore are validated (hashable int/bool) by build_search_params
+    key = (collection_name, normalize_query(query), k, ef, rescore)
+    try:
+        output_text = retrieve_flight.do(key, lambda: answer_query(collection_name, query, k, search_params, deadline), timeout=single_flight_timeout)
+    except TimeoutError as e:
+        return {"error": str(e)}, 504
+
+    return {"results":output_text}
 
-    client = QdrantClient(url=qdrant_url, prefer_grpc=True, api_key=qdrant_api_key)
+# Index committed agent journals and todos into a per-project collection
+from agent_indexer import default_collection_name, index_agent_documents
+from ai_agent_utils import get_repo_root
 
+agent_repo_path = os.environ.get('agent_repo_path')
+index_deadline = float(os.environ.get('index_deadline', 600))
+
+# Concurrent index requests for the same collection share one run
+index_flight = SingleFlight()
+
+def index_agents_run(collection_name, repo_root, profile, deadline):
+    client = QdrantClient(url=qdrant_url, prefer_grpc=qdrant_prefer_grpc, api_key=qdrant_api_key)
     embeddings = CohereEmbeddings(model="multilingual-22-12", cohere_api_key=cohere_api_key)
-    qdrant = Qdrant(client=client, collection_name=collection_name, embedding_function=embeddings.embed_query)
-    search_results = qdrant.similarity_search(query, k=2)
-    chain = load_qa_chain(OpenAI(openai_api_key=openai_api_key,temperature=0.2), chain_type="stuff")
-    results = chain({"input_documents": search_results, "question": query}, return_only_outputs=True)
-    
-    return {"results":results["output_text"]}
\ No newline at end of file
+    return index_agent_documents(
+        client,
+        lambda texts: upstreams["cohere"].call(embeddings.embed_documents, texts, deadline=deadline),
+        collection_name=collection_name,
+        repo_root=repo_root,
+        profile=profile,
+        qdrant_call=lambda fn, *args, **kwargs: upstreams["qdrant"].call(fn, *args, deadline=deadline, **kwargs),
+    )
+
+@app.route('/index_agents', methods=['POST'])
+def index_agents():
+    body = request.get_json(silent=True) or {}
+    collection_name = body.get("collection_name")
+    profile = body.get("profile")
+    deadline = time.monotonic() + index_deadline
+    if collection_name is not None and (not isinstance(collection_name, str) or not collection_name):
+        return {"error": "collection_name must be a non-empty string"}, 400
+    try:
+        build_collection_config(profile)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Resolve the default name first, so requests with and without it share one run
+    repo_root = agent_repo_path or get_repo_root()
+    collection_name = collection_name or default_collection_name(repo_root)
+    try:
+        result = index_flight.do(collection_name, lambda: index_agents_run(collection_name, repo_root, profile, deadline), timeout=index_deadline)
+    except TimeoutError as e:
+        return {"error": str(e)}, 504
+
+    return result
+
+# Queue depth, wait times and rejections per upstream
+@app.route('/metrics')
+def metrics():
+    return {
+        "upstreams": {name: limiter.snapshot() for name, limiter in upstreams.items()},
+        "single_flight": {"in_flight": retrieve_flight.in_flight(), **retrieve_flight.stats},
+    }
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for AI Agent document drop-off utilities.
+
+Every benchmark runs against a throwaway git repository in a temporary
+directory, so the real repository is never touched. Results are printed
+(or written) as JSON so runs from different versions can be compared.
+
+Usage:
+    python bench_ai_agent_utils.py
+    python bench_ai_agent_utils.py --drops 500 --writers 8 --output bench.json
+    python bench_ai_agent_utils.py --list-sizes 1000,10000,100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import ai_agent_utils
+from ai_agent_utils import (
+    drop_off_document,
+    list_agent_documents,
+    load_config,
+)
+
+
+STAGES = ["path", "write", "add", "commit", "git_other", "non_git", "total"]
+BASE_TIMESTAMP = datetime(2025, 1, 1)
+
+
+class _TimedSubprocess:
+    """
+    Stand-in for the subprocess module inside ai_agent_utils.
+
+    Times each git invocation and records it under the git subcommand name
+    ("add", "commit", ...) in the calling thread's current sample. Functions
+    wrapped with stage() are recorded under their stage name instead, git
+    calls they make included.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def sample(self):
+        return getattr(self._local, "sample", None)
+
+    @sample.setter
+    def sample(self, value):
+        self._local.sample = value
+
+    def run(self, args, *rest, **kwargs):
+        started = time.perf_counter()
+        try:
+            return subprocess.run(args, *rest, **kwargs)
+        finally:
+            sample = self.sample
+            if sample is not None and len(args) > 1 and getattr(self._local, "stage", None) is None:
+                sample[args[1]] = sample.get(args[1], 0.0) + time.perf_counter() - started
+
+    def stage(self, name, fn):
+        """Wrap fn so that calls to it are timed under the given stage name."""
+        def timed_fn(*args, **kwargs):
+            self._local.stage = name
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.stage = None
+                sample = self.sample
+                if sample is not None:
+                    sample[name] = sample.get(name, 0.0) + time.perf_counter() - started
+        return timed_fn
+
+    def __getattr__(self, name):
+        return getattr(subprocess, name)
+
+
+@contextmanager
+def throwaway_repo():
+    """Create a temporary git repository and make it the working directory."""
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_ai_agents_") as tmp:
+        repo = Path(tmp)
+        for cmd in (
+            ["git", "init", "-q"],
+            ["git", "config", "user.name", "Bench"],
+            ["git", "config", "user.email", "bench@example.com"],
+            ["git", "config", "commit.gpgsign", "false"],
+            ["git", "commit", "-q", "--allow-empty", "-m", "Initial commit"],
+        ):
+            subprocess.run(cmd, cwd=repo, check=True, capture_output=True)
+        os.chdir(repo)
+        try:
+            yield repo
+        finally:
+            os.chdir(previous_cwd)
+
+
+@contextmanager
+def timed_git():
+    """Route ai_agent_utils git calls, path generation and writes through a _TimedSubprocess."""
+    timed = _TimedSubprocess()
+    originals = {
+        "subprocess": ai_agent_utils.subprocess,
+        "get_document_path": ai_agent_utils.get_document_path,
+        "save_agent_document": ai_agent_utils.save_agent_document,
+    }
+    ai_agent_utils.subprocess = timed
+    ai_agent_utils.get_document_path = timed.stage("path", originals["get_document_path"])
+    ai_agent_utils.save_agent_document = timed.stage("write", originals["save_agent_document"])
+    try:
+        yield timed
+    finally:
+        for name, original in originals.items():
+            setattr(ai_agent_utils, name, original)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(values: list) -> dict:
+    """Summarize latencies (seconds) as milliseconds."""
+    return {
+        "count": len(values),
+        "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+        "p50_ms": 1000 * percentile(values, 0.50),
+        "p99_ms": 1000 * percentile(values, 0.99),
+        "max_ms": 1000 * max(values) if values else 0.0,
+    }
+
+
+def timed_drop(timed: _TimedSubprocess, agent_name: str, sequence: int) -> dict:
+    """
+    Perform one journal drop-off with drop_off_document(), timing each stage.
+
+    "total" is the whole drop_off_document() call; "path" is
+    get_document_path() (including its git lookups), "write" is
+    save_agent_document(), "add" and "commit" are the git add and git commit
+    calls, "git_other" the remaining git calls (repository lookups), and
+    "non_git" everything else (config loading, search index update).
+    """
+    timestamp = (BASE_TIMESTAMP + timedelta(seconds=sequence)).strftime(load_config()['TIMESTAMP_FORMAT'])
+    content = f"# Journal {sequence}\n\nBenchmark entry from {agent_name}.\n"
+    sample = {}
+    timed.sample = sample
+
+    started = time.perf_counter()
+    try:
+        drop_off_document(content, "journal", agent_name=agent_name,
+                          commit_message=f"Add journal entry from {agent_name}", timestamp=timestamp)
+    finally:
+        timed.sample = None
+    total = time.perf_counter() - started
+
+    path = sample.pop("path", 0.0)
+    write = sample.pop("write", 0.0)
+    git_total = sum(sample.values())
+    return {
+        "path": path,
+        "write": write,
+        "add": sample.get("add", 0.0),
+        "commit": sample.get("commit", 0.0),
+        "git_other": git_total - sample.get("add", 0.0) - sample.get("commit", 0.0),
+        "non_git": total - git_total - path - write,
+        "total": total,
+    }
+
+
+def bench_drops(drops: int, writers: int) -> dict:
+    """Measure drop-off throughput and per-stage latency."""
+    samples = []
+    errors = []
+
+    with throwaway_repo(), timed_git() as timed:
+        def writer(index: int):
+            for i in range(index, drops, writers):
+                try:
+                    samples.append(timed_drop(timed, f"bench_agent_{index}", i))
+                except Exception as e:
+                    errors.append(str(e).splitlines()[0] if str(e) else type(e).__name__)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            list(pool.map(writer, range(writers)))
+        elapsed = time.perf_counter() - started
+        leftovers = subprocess.run(["git", "status", "--porcelain"], capture_output=True,
+                                   text=True).stdout.splitlines()
+
+    return {
+        "writers": writers,
+        "drops": drops,
+        "succeeded": len(samples),
+        "failed": len(errors),
+        "error_examples": sorted(set(errors))[:5],
+        "uncommitted_paths": len(leftovers),
+        "elapsed_s": elapsed,
+        "drops_per_second": len(samples) / elapsed if elapsed else 0.0,
+        "stages": {stage: summarize([s[stage] for s in samples]) for stage in STAGES},
+    }
+
+
+def bench_listing(sizes: list, repeats: int) -> list:
+    """Measure list_agent_documents() latency against tree size."""
+    results = []
+
+    with throwaway_repo() as repo:
+        config = load_config()
+        journal_dir = repo / config['AGENT_DOCS_DIR'] / config['JOURNAL_DIR']
+        journal_dir.mkdir(parents=True)
+        created = 0
+
+        for size in sorted(sizes):
+            # Grow the tree in place; listing only reads the working tree
+            while created < size:
+                timestamp = (BASE_TIMESTAMP + timedelta(seconds=created)).strftime(config['TIMESTAMP_FORMAT'])
+                (journal_dir / f"journal_{timestamp}_agent_{created % 50}.md").write_text("# Journal\n")
+                created += 1
+
+            for label, kwargs in (("all", {}), ("by_agent", {"agent_name": "agent_7"})):
+                timings = []
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    found = list_agent_documents(**kwargs)
+                    timings.append(time.perf_counter() - started)
+                results.append({
+                    "documents": size,
+                    "filter": label,
+                    "returned": len(found),
+                    **summarize(timings),
+                })
+
+    return results
+
+
+def git_version() -> str:
+    """Return the installed git version string."""
+    return subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the AI agent drop-off utilities")
+    parser.add_argument("--drops", type=int, default=200, help="drops per writer configuration")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent writers for the concurrent run")
+    parser.add_argument("--list-sizes", default="1000,10000,100000",
+                        help="comma-separated document counts for the listing benchmark")
+    parser.add_argument("--list-repeats", type=int, default=5, help="timed listings per tree size")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_version(),
+            "args": vars(args),
+        },
+        "single_writer": bench_drops(args.drops, 1),
+        "concurrent_writers": bench_drops(args.drops, args.writers),
+        "listing": bench_listing([int(size) for size in args.list_sizes.split(",") if size], args.list_repeats),
+    }
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Offline load-testing tools for the RAG service in app.py."""
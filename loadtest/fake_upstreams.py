@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Cohere, OpenAI and Qdrant APIs, plus a PDF host.
+
+Each fake implements only the endpoints app.py uses, answers with
+deterministic data, and sleeps for a configurable artificial latency before
+responding, so the RAG service can be load-tested on one machine with no
+network access and no API keys.
+
+Usage (standalone):
+    python -m loadtest.fake_upstreams --cohere-latency 30 --openai-latency 400
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import numpy as np
+
+
+# Configuration defaults
+DEFAULT_VECTOR_SIZE = 768
+DEFAULT_PDF_PAGES = 8
+
+
+def deterministic_vector(text: str, size: int = DEFAULT_VECTOR_SIZE) -> list:
+    """
+    Map a text to a unit vector that depends only on the text.
+
+    Args:
+        text: Text to embed
+        size: Vector dimension
+
+    Returns:
+        list: Normalized vector of floats
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(size)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def build_pdf(pages: int = DEFAULT_PDF_PAGES, lines_per_page: int = 30) -> bytes:
+    """
+    Build a small text PDF that pypdf can extract text from.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Lines of text per page
+
+    Returns:
+        bytes: PDF file content
+    """
+    words = ["qdrant", "cohere", "vector", "search", "embedding", "latency", "agent",
+             "journal", "throughput", "language", "model", "collection", "index"]
+    rng = random.Random(pages * 1000 + lines_per_page)
+    font_id = 3 + 2 * pages
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(pages)), pages),
+    ]
+    for page in range(pages):
+        lines = [" ".join(rng.choice(words) for _ in range(10)) for _ in range(lines_per_page)]
+        text = " T* ".join(f"(Page {page + 1} line {n + 1}: {line}) Tj" for n, line in enumerate(lines))
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {text} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Contents {4 + 2 * page} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    """Base handler: JSON helpers, artificial latency, quiet logging."""
+
+    latency = 0.0
+    jitter = 0.0
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self):
+        path = self.path.split("?", 1)[0]
+        for method, pattern, handler_name in self.routes:
+            match = re.fullmatch(pattern, path)
+            if method == self.command and match:
+                delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                return getattr(self, handler_name)(*match.groups())
+        self._send(404, {"message": f"No fake route for {self.command} {path}"})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class FakeCohereHandler(_FakeHandler):
+    """Cohere v1 /embed."""
+
+    vector_size = DEFAULT_VECTOR_SIZE
+    routes = [("POST", r"/v1/embed", "embed")]
+
+    def embed(self):
+        body = self._read_json()
+        texts = body.get("texts", [])
+        self._send(200, {
+            "id": str(uuid.uuid4()),
+            "texts": texts,
+            "embeddings": [deterministic_vector(text, self.vector_size) for text in texts],
+            "meta": {"api_version": {"version": "1"}},
+        })
+
+
+class FakeOpenAIHandler(_FakeHandler):
+    """OpenAI v1 /completions (and /chat/completions)."""
+
+    routes = [
+        ("POST", r"/v1/completions", "completions"),
+        ("POST", r"/v1/chat/completions", "chat_completions"),
+    ]
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f" Offline answer {digest}."
+
+    @staticmethod
+    def _usage(prompt: str, answer: str) -> dict:
+        prompt_tokens, completion_tokens = len(prompt.split()), len(answer.split())
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def completions(self):
+        body = self._read_json()
+        prompts = body.get("prompt", "")
+        prompts = prompts if isinstance(prompts, list) else [prompts]
+        choices = [{"text": self._answer(p), "index": i, "logprobs": None, "finish_reason": "stop"}
+                   for i, p in enumerate(prompts)]
+        joined = " ".join(prompts)
+        self._send(200, {
+            "id": f"cmpl-{uuid.uuid4().hex}", "object": "text_completion", "created": int(time.time()),
+            "model": body.get("model", "fake"), "choices": choices,
+            "usage": self._usage(joined, " ".join(c["text"] for c in choices)),
+        })
+
+    def chat_completions(self):
+        body = self._read_json()
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        answer = self._answer(prompt)
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": self._usage(prompt, answer),
+        })
+
+
+class FakeQdrantHandler(_FakeHandler):
+    """Qdrant REST: collection create/delete, payload index, upsert and search."""
+
+    store = None  # {collection: {"ids": [...], "vectors": np.ndarray, "payloads": [...]}}
+    lock = None
+    routes = [
+        ("PUT", r"/collections/([^/]+)", "create_collection"),
+        ("DELETE", r"/collections/([^/]+)", "delete_collection"),
+        ("PUT", r"/collections/([^/]+)/index", "create_index"),
+        ("PUT", r"/collections/([^/]+)/points", "upsert"),
+        ("POST", r"/collections/([^/]+)/points/search", "search"),
+    ]
+
+    def _ok(self, result):
+        self._send(200, {"result": result, "status": "ok", "time": 0.0})
+
+    def create_collection(self, name):
+        self._read_json()
+        with self.lock:
+            self.store[name] = {"ids": [], "vectors": None, "payloads": []}
+        self._ok(True)
+
+    def delete_collection(self, name):
+        with self.lock:
+            existed = self.store.pop(name, None) is not None
+        self._ok(existed)
+
+    def create_index(self, name):
+        self._read_json()
+        self._ok({"operation_id": 0, "status": "completed"})
+
+    def upsert(self, name):
+        batch = self._read_json().get("batch", {})
+        vectors = np.asarray(batch.get("vectors", []), dtype=np.float32)
+        with self.lock:
+            collection = self.store.get(name)
+            if collection is None:
+                return self._send(404, {"status": {"error": f"Collection {name} not found"}})
+            collection["ids"].extend(batch.get("ids", []))
+            collection["payloads"].extend(batch.get("payloads") or [{}] * len(vectors))
+            existing = collection["vectors"]
+            collection["vectors"] = vectors if existing is None else np.vstack([existing, vectors])
+        self._ok({"operation_id": 0, "status": "completed"})
+
+    def search(self, name):
+        body = self._read_json()
+        with self.lock:
+            collection = self.store.get(name)
+            if collection is None:
+                return self._send(404, {"status": {"error": f"Collection {name} not found"}})
+            ids, vectors, payloads = collection["ids"], collection["vectors"], collection["payloads"]
+        if vectors is None or not len(vectors):
+            return self._ok([])
+
+        query = np.asarray(body.get("vector"), dtype=np.float32)
+        scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+        top = np.argsort(-scores)[:int(body.get("limit", 10))]
+        self._ok([
+            {"id": ids[i], "version": 0, "score": float(scores[i]),
+             "payload": payloads[i] if body.get("with_payload") else None, "vector": None}
+            for i in top
+        ])
+
+
+class FakePDFHandler(_FakeHandler):
+    """Serves generated PDFs at /<name>.pdf."""
+
+    pdf = b""
+    routes = [("GET", r"/([^/]+)\.pdf", "pdf_file")]
+
+    def pdf_file(self, name):
+        self._send(200, self.pdf, content_type="application/pdf")
+
+
+class FakeUpstreams:
+    """
+    Run the fake Cohere, OpenAI, Qdrant and PDF servers in background threads.
+
+    Attributes:
+        urls: Base URL of each fake, keyed by "cohere", "openai", "qdrant", "pdf"
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        cohere_latency: float = 0.0,
+        openai_latency: float = 0.0,
+        qdrant_latency: float = 0.0,
+        jitter: float = 0.0,
+        vector_size: int = DEFAULT_VECTOR_SIZE,
+        pdf_pages: int = DEFAULT_PDF_PAGES,
+        ports: Optional[dict] = None
+    ):
+        """
+        Args:
+            host: Interface to bind
+            cohere_latency: Seconds added to every Cohere response
+            openai_latency: Seconds added to every OpenAI response
+            qdrant_latency: Seconds added to every Qdrant response
+            jitter: Extra uniform random latency (0..jitter seconds) per response
+            vector_size: Dimension of the fake embeddings
+            pdf_pages: Pages in the served PDF
+            ports: Optional fixed port per fake (0 or missing picks a free port)
+        """
+        ports = ports or {}
+        handlers = {
+            "cohere": type("CohereHandler", (FakeCohereHandler,),
+                           {"latency": cohere_latency, "jitter": jitter, "vector_size": vector_size}),
+            "openai": type("OpenAIHandler", (FakeOpenAIHandler,),
+                           {"latency": openai_latency, "jitter": jitter}),
+            "qdrant": type("QdrantHandler", (FakeQdrantHandler,),
+                           {"latency": qdrant_latency, "jitter": jitter, "store": {}, "lock": threading.Lock()}),
+            "pdf": type("PDFHandler", (FakePDFHandler,), {"pdf": build_pdf(pdf_pages)}),
+        }
+        self._servers = {name: ThreadingHTTPServer((host, ports.get(name, 0)), handler)
+                         for name, handler in handlers.items()}
+        for server in self._servers.values():
+            server.daemon_threads = True
+        self.urls = {name: f"http://{host}:{server.server_address[1]}" for name, server in self._servers.items()}
+        self._threads = []
+
+    def environment(self) -> dict:
+        """
+        Environment variables that point app.py and its SDKs at the fakes.
+
+        Returns:
+            dict: Variable name to value
+        """
+        return {
+            "cohere_api_key": "offline",
+            "openai_api_key": "offline",
+            "qdrant_url": self.urls["qdrant"],
+            "qdrant_prefer_grpc": "false",
+            "CO_API_URL": self.urls["cohere"],
+            "OPENAI_API_BASE": f"{self.urls['openai']}/v1",
+        }
+
+    def start(self) -> "FakeUpstreams":
+        for server in self._servers.values():
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run fake Cohere, OpenAI and Qdrant servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--cohere-port", type=int, default=0)
+    parser.add_argument("--openai-port", type=int, default=0)
+    parser.add_argument("--qdrant-port", type=int, default=0)
+    parser.add_argument("--pdf-port", type=int, default=0)
+    parser.add_argument("--cohere-latency", type=float, default=0.0, help="milliseconds")
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="milliseconds")
+    parser.add_argument("--qdrant-latency", type=float, default=0.0, help="milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="milliseconds of extra random latency")
+    parser.add_argument("--vector-size", type=int, default=DEFAULT_VECTOR_SIZE)
+    parser.add_argument("--pdf-pages", type=int, default=DEFAULT_PDF_PAGES)
+    args = parser.parse_args()
+
+    fakes = FakeUpstreams(
+        host=args.host,
+        cohere_latency=args.cohere_latency / 1000,
+        openai_latency=args.openai_latency / 1000,
+        qdrant_latency=args.qdrant_latency / 1000,
+        jitter=args.jitter / 1000,
+        vector_size=args.vector_size,
+        pdf_pages=args.pdf_pages,
+        ports={"cohere": args.cohere_port, "openai": args.openai_port,
+               "qdrant": args.qdrant_port, "pdf": args.pdf_port},
+    ).start()
+
+    print("Fake upstreams running. Export these before starting app.py:")
+    for key, value in fakes.environment().items():
+        print(f"export {key}={value}")
+    print(f"# PDF for /embed: {fakes.urls['pdf']}/sample.pdf")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fakes.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
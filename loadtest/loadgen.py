@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Load generator for the RAG service's /embed and /retrieve routes.
+
+By default it starts the local fakes from loadtest.fake_upstreams, runs
+app.py in-process against them, and needs no network access or API keys.
+Pass --target to load an already running server instead.
+
+Usage:
+    python -m loadtest.loadgen --concurrency 1,8,32 --requests 200
+    python -m loadtest.loadgen --endpoint retrieve --distinct-queries 5 \\
+        --cohere-latency 30 --qdrant-latency 5 --openai-latency 400
+    python -m loadtest.loadgen --target http://127.0.0.1:8000 --pdf-url https://example.com/a.pdf
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import requests
+
+from loadtest.fake_upstreams import FakeUpstreams
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_app(environment: dict) -> tuple:
+    """
+    Import app.py with the given environment and serve it on a free port.
+
+    Returns:
+        tuple: (base URL, werkzeug server)
+    """
+    os.environ.update(environment)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app as rag_app
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # Keep per-request logging out of the measured latencies
+
+    server = make_server("127.0.0.1", 0, rag_app.app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def run_level(
+    target: str,
+    endpoint: str,
+    concurrency: int,
+    total: int,
+    body_for,
+    timeout: float
+) -> dict:
+    """
+    Send total requests to one endpoint with a fixed number of workers.
+
+    Args:
+        target: Base URL of the service
+        endpoint: "embed" or "retrieve"
+        concurrency: Number of concurrent workers
+        total: Number of requests to send
+        body_for: Callable mapping a request index to its JSON body
+        timeout: Per-request client timeout in seconds
+
+    Returns:
+        dict: Throughput, latency percentiles (ms) and status counts
+    """
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(total))
+    local = threading.local()
+
+    def worker():
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            try:
+                status = session.post(f"{target}/{endpoint}", json=body_for(index), timeout=timeout).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "success_rps": ok / elapsed if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": 1000 * percentile(latencies, 0.50),
+            "p90": 1000 * percentile(latencies, 0.90),
+            "p99": 1000 * percentile(latencies, 0.99),
+            "max": 1000 * max(latencies) if latencies else 0.0,
+        },
+    }
+
+
+def fetch_metrics(target: str) -> Optional[dict]:
+    """Return the service's /metrics snapshot, if it has one."""
+    try:
+        response = requests.get(f"{target}/metrics", timeout=5)
+        return response.json() if response.ok else None
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the RAG service /embed and /retrieve routes")
+    parser.add_argument("--target", help="base URL of a running service (default: run app.py in-process on fakes)")
+    parser.add_argument("--endpoint", choices=["embed", "retrieve", "both"], default="both")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--collection", default="loadtest")
+    parser.add_argument("--distinct-queries", type=int, default=50,
+                        help="number of different /retrieve questions to cycle through")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--pdf-url", help="PDF to embed (default: the fake PDF host)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request in seconds")
+    parser.add_argument("--cohere-latency", type=float, default=20.0, help="fake Cohere latency in ms")
+    parser.add_argument("--openai-latency", type=float, default=200.0, help="fake OpenAI latency in ms")
+    parser.add_argument("--qdrant-latency", type=float, default=5.0, help="fake Qdrant latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random fake latency in ms")
+    parser.add_argument("--pdf-pages", type=int, default=8)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    fakes = server = None
+    target = args.target
+    pdf_url = args.pdf_url
+    if target is None:
+        fakes = FakeUpstreams(
+            cohere_latency=args.cohere_latency / 1000,
+            openai_latency=args.openai_latency / 1000,
+            qdrant_latency=args.qdrant_latency / 1000,
+            jitter=args.jitter / 1000,
+            pdf_pages=args.pdf_pages,
+        ).start()
+        target, server = start_app(fakes.environment())
+        pdf_url = pdf_url or f"{fakes.urls['pdf']}/sample.pdf"
+    elif pdf_url is None and args.endpoint != "retrieve":
+        parser.error("--pdf-url is required with --target when loading /embed")
+
+    def embed_body(index):
+        return {"collection_name": f"{args.collection}_embed_{index}", "file_url": pdf_url}
+
+    def retrieve_body(index):
+        return {"collection_name": args.collection, "k": args.k,
+                "query": f"What does the document say about topic {index % args.distinct_queries}?"}
+
+    try:
+        levels = [int(level) for level in args.concurrency.split(",") if level]
+        results = []
+
+        if args.endpoint in ("embed", "both"):
+            for level in levels:
+                results.append(run_level(target, "embed", level, args.requests, embed_body, args.timeout))
+
+        if args.endpoint in ("retrieve", "both"):
+            if pdf_url:
+                seeded = requests.post(f"{target}/embed", json={"collection_name": args.collection,
+                                                                "file_url": pdf_url}, timeout=args.timeout)
+                seeded.raise_for_status()
+            for level in levels:
+                results.append(run_level(target, "retrieve", level, args.requests, retrieve_body, args.timeout))
+
+        report = {
+            "meta": {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "target": "in-process app.py with local fakes" if fakes else target,
+                "args": vars(args),
+            },
+            "results": results,
+            "service_metrics": fetch_metrics(target),
+        }
+    finally:
+        if server is not None:
+            server.shutdown()
+        if fakes is not None:
+            fakes.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""
+RAG Service Utilities
+
+This module provides helpers used by the Flask RAG service in app.py: request
+coalescing and limits for upstream traffic (Cohere, Qdrant, OpenAI), and
+Qdrant collection tuning profiles.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Optional, Union
+
+from qdrant_client.http import models as rest
+
+
+# Configuration defaults
+DEFAULT_SINGLE_FLIGHT_TIMEOUT = 60.0
+DEFAULT_MAX_QUEUE = 64
+WAIT_SAMPLE_SIZE = 1024
+
+# Segments larger than this (in KB) are memory-mapped from disk instead of held in RAM
+ON_DISK_MEMMAP_THRESHOLD_KB = 20000
+
+# Named collection profiles accepted by /embed in place of an explicit profile
+COLLECTION_PROFILES = {
+    "default": {},
+    "low_memory": {
+        "hnsw": {"m": 16, "ef_construct": 100, "on_disk": True},
+        "quantization": {"type": "scalar", "quantile": 0.99, "always_ram": True},
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+    },
+    "low_latency": {
+        "hnsw": {"m": 32, "ef_construct": 256},
+        "quantization": {"type": "scalar", "quantile": 0.99, "always_ram": True},
+    },
+}
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query string for request deduplication.
+
+    Collapses runs of whitespace and case-folds the text so that trivially
+    different spellings of the same question share one key.
+
+    Args:
+        query: Raw query string
+
+    Returns:
+        str: Normalized query
+    """
+    return " ".join(query.split()).casefold()
+
+
+class _Call:
+    """A single in-flight call shared by a leader and its followers."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share the same key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for the leader's outcome instead of
+    repeating the work. Results are not cached: once the leader finishes the
+    key is forgotten and the next call runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        timeout: Optional[float] = DEFAULT_SINGLE_FLIGHT_TIMEOUT
+    ) -> Any:
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Args:
+            key: Deduplication key
+            fn: Zero-argument callable doing the actual work
+            timeout: Maximum seconds a follower waits for the leader
+                (None waits forever). The leader itself is not interrupted.
+
+        Returns:
+            Any: The value returned by fn()
+
+        Raises:
+            TimeoutError: If a follower waited longer than timeout
+            Exception: Whatever fn() raised, re-raised in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.stats["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.stats["coalesced"] += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(timeout):
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise TimeoutError(f"Timed out after {timeout}s waiting for in-flight request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        """
+        Return the number of keys currently being computed.
+
+        Returns:
+            int: Number of in-flight keys
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+class UpstreamRejected(RuntimeError):
+    """
+    Raised when an upstream call cannot be admitted within its deadline.
+
+    Attributes:
+        upstream: Name of the upstream service
+        status: HTTP status the service should answer with (429 or 503)
+        retry_after: Suggested client back-off in seconds
+    """
+
+    def __init__(self, upstream: str, reason: str, status: int, retry_after: float):
+        super().__init__(f"{upstream}: {reason}")
+        self.upstream = upstream
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class UpstreamLimiter:
+    """
+    Concurrency semaphore plus token-bucket rate limiter for one upstream API.
+
+    Callers queue for a slot until their deadline. A call is rejected right
+    away, instead of waiting and failing late, when the queue is already full
+    (503) or when the rate limit means no token can be had before the
+    deadline (429).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE
+    ):
+        """
+        Args:
+            name: Upstream name used in errors and metrics
+            max_concurrency: Maximum number of calls in flight at once
+            rate: Sustained calls per second (None or 0 disables rate limiting)
+            burst: Token bucket capacity (defaults to max_concurrency)
+            max_queue: Maximum number of callers waiting for admission
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1 for {name}")
+
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate = rate or None
+        self.burst = burst or max_concurrency
+        self.max_queue = max_queue
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._counters = {"admitted": 0, "queue_full": 0, "rate_limited": 0, "timed_out": 0}
+
+    def _reserve_token(self, now: float) -> float:
+        """Take one token and return how long the caller must wait for it."""
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, deadline: Optional[float] = None) -> None:
+        """
+        Wait for admission to call the upstream.
+
+        Args:
+            deadline: Absolute time.monotonic() by which the call must start
+                (None waits indefinitely)
+
+        Raises:
+            UpstreamRejected: If the call cannot be admitted before the deadline
+        """
+        started = time.monotonic()
+        with self._lock:
+            if self._queue_depth >= self.max_queue:
+                self._counters["queue_full"] += 1
+                raise UpstreamRejected(self.name, "too many queued requests", 503, 1.0)
+
+            token_wait = 0.0
+            if self.rate:
+                token_wait = self._reserve_token(started)
+                if token_wait and deadline is not None and started + token_wait > deadline:
+                    self._tokens += 1  # Give the reservation back
+                    self._counters["rate_limited"] += 1
+                    raise UpstreamRejected(self.name, "rate limit exceeded", 429, token_wait)
+
+            self._queue_depth += 1
+
+        try:
+            if token_wait:
+                time.sleep(token_wait)
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._slots.acquire(timeout=timeout):
+                with self._lock:
+                    self._counters["timed_out"] += 1
+                raise UpstreamRejected(self.name, "timed out waiting for a free slot", 503, 1.0)
+        finally:
+            with self._lock:
+                self._queue_depth -= 1
+
+        with self._lock:
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            self._waits.append(time.monotonic() - started)
+
+    def release(self) -> None:
+        """Release a slot obtained with acquire()."""
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None):
+        """
+        Context manager holding an admission slot for the duration of a call.
+
+        Args:
+            deadline: Absolute time.monotonic() by which the call must start
+        """
+        self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def call(self, fn: Callable, *args, deadline: Optional[float] = None, **kwargs) -> Any:
+        """
+        Call fn(*args, **kwargs) once admitted.
+
+        Args:
+            fn: Callable performing the upstream request
+            deadline: Absolute time.monotonic() by which the call must start
+
+        Returns:
+            Any: The value returned by fn
+
+        Raises:
+            UpstreamRejected: If the call cannot be admitted before the deadline
+        """
+        with self.slot(deadline):
+            return fn(*args, **kwargs)
+
+    def snapshot(self) -> dict:
+        """
+        Return current queue and wait-time metrics.
+
+        Returns:
+            dict: Limits, in-flight and queued counts, admission counters and
+                wait-time statistics (seconds) over recent calls
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "rate": self.rate,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queue_depth,
+                **self._counters,
+                "wait_seconds": {
+                    "samples": len(waits),
+                    "mean": sum(waits) / len(waits) if waits else 0.0,
+                    "p50": _percentile(waits, 0.50),
+                    "p99": _percentile(waits, 0.99),
+                    "max": waits[-1] if waits else 0.0,
+                },
+            }
+
+
+def _check_keys(section: str, values: dict, allowed: set) -> None:
+    """Raise ValueError for keys a profile section does not understand."""
+    if not isinstance(values, dict):
+        raise ValueError(f"Profile section '{section}' must be an object")
+    unknown = set(values) - allowed
+    if unknown:
+        raise ValueError(f"Unknown key(s) in profile section '{section}': {', '.join(sorted(unknown))}")
+
+
+def positive_int(name: str, value: Any) -> int:
+    """Validate a strictly positive integer setting."""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return value
+
+
+def _optional_bool(name: str, value: Any) -> Optional[bool]:
+    """Validate an optional boolean setting."""
+    if value is not None and not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false")
+    return value
+
+
+def _quantile(value: Any) -> Optional[float]:
+    """Validate a scalar quantization quantile (0.5 to 1)."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0.5 <= value <= 1:
+        raise ValueError("quantization.quantile must be a number between 0.5 and 1")
+    return float(value)
+
+
+def _quantization_config(settings: dict):
+    """Build the Qdrant quantization config for a profile's quantization section."""
+    _check_keys("quantization", settings, {"type", "quantile", "always_ram", "compression"})
+    kind = settings.get("type")
+    always_ram = _optional_bool("quantization.always_ram", settings.get("always_ram"))
+
+    if kind == "scalar":
+        return rest.ScalarQuantization(
+            scalar=rest.ScalarQuantizationConfig(
+                type=rest.ScalarType.INT8,
+                quantile=_quantile(settings.get("quantile")),
+                always_ram=always_ram,
+            )
+        )
+    if kind == "product":
+        if not hasattr(rest, "ProductQuantization"):
+            raise ValueError("Product quantization is not supported by the installed qdrant-client")
+        return rest.ProductQuantization(
+            product=rest.ProductQuantizationConfig(
+                compression=rest.CompressionRatio(settings.get("compression", "x16")),
+                always_ram=always_ram,
+            )
+        )
+    raise ValueError(f"Invalid quantization type: {kind}. Must be 'scalar' or 'product'")
+
+
+def build_collection_config(profile: Union[str, dict, None]) -> tuple[dict, dict]:
+    """
+    Translate a collection profile into Qdrant collection settings.
+
+    A profile is either the name of an entry in COLLECTION_PROFILES or an
+    object with any of these keys:
+
+        hnsw: {"m": int, "ef_construct": int, "on_disk": bool}
+        quantization: {"type": "scalar", "quantile": float, "always_ram": bool}
+                      or {"type": "product", "compression": "x16", "always_ram": bool}
+        on_disk_vectors: bool
+        on_disk_payload: bool
+        payload_indexes: {"<payload field>": "keyword" | "integer" | "float" | "geo" | "text"}
+
+    Args:
+        profile: Profile name, profile object, or None for Qdrant defaults
+
+    Returns:
+        tuple[dict, dict]: Keyword arguments for QdrantClient.recreate_collection()
+            and a mapping of payload field name to PayloadSchemaType to index
+
+    Raises:
+        ValueError: If the profile is unknown or invalid
+    """
+    if profile is None:
+        profile = "default"
+    if isinstance(profile, str):
+        if profile not in COLLECTION_PROFILES:
+            raise ValueError(f"Unknown collection profile: {profile}. Must be one of {', '.join(COLLECTION_PROFILES)}")
+        profile = COLLECTION_PROFILES[profile]
+
+    _check_keys("profile", profile, {"hnsw", "quantization", "on_disk_vectors", "on_disk_payload", "payload_indexes"})
+    create_kwargs = {}
+
+    if "hnsw" in profile:
+        hnsw = profile["hnsw"]
+        _check_keys("hnsw", hnsw, {"m", "ef_construct", "on_disk"})
+        create_kwargs["hnsw_config"] = rest.HnswConfigDiff(
+            m=positive_int("hnsw.m", hnsw["m"]) if "m" in hnsw else None,
+            ef_construct=positive_int("hnsw.ef_construct", hnsw["ef_construct"]) if "ef_construct" in hnsw else None,
+            on_disk=_optional_bool("hnsw.on_disk", hnsw.get("on_disk")),
+        )
+
+    if "quantization" in profile:
+        create_kwargs["quantization_config"] = _quantization_config(profile["quantization"])
+
+    if _optional_bool("on_disk_vectors", profile.get("on_disk_vectors")):
+        create_kwargs["optimizers_config"] = rest.OptimizersConfigDiff(memmap_threshold=ON_DISK_MEMMAP_THRESHOLD_KB)
+
+    if "on_disk_payload" in profile:
+        create_kwargs["on_disk_payload"] = _optional_bool("on_disk_payload", profile["on_disk_payload"])
+
+    payload_indexes = {}
+    indexes = profile.get("payload_indexes", {})
+    if not isinstance(indexes, dict):
+        raise ValueError("Profile section 'payload_indexes' must be an object")
+    for field_name, schema in indexes.items():
+        try:
+            payload_indexes[field_name] = rest.PayloadSchemaType(schema)
+        except ValueError:
+            raise ValueError(f"Invalid payload index type for {field_name}: {schema}")
+
+    return create_kwargs, payload_indexes
+
+
+def build_search_params(ef: Optional[int] = None, rescore: Optional[bool] = None):
+    """
+    Build search-time parameters matching a collection profile.
+
+    Args:
+        ef: HNSW search beam size (larger is more accurate and slower)
+        rescore: Whether to re-rank quantized results using the original vectors
+
+    Returns:
+        SearchParams or None: Qdrant search parameters, None for server defaults
+
+    Raises:
+        ValueError: If ef is not a positive integer or rescore is not a boolean
+    """
+    if ef is None and rescore is None:
+        return None
+    return rest.SearchParams(
+        hnsw_ef=positive_int("ef", ef) if ef is not None else None,
+        quantization=rest.QuantizationSearchParams(rescore=_optional_bool("rescore", rescore)) if rescore is not None else None,
+    )
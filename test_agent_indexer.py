@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Simple tests for the agent history indexer.
+
+These tests use an in-memory Qdrant client and a deterministic fake
+embedding function, so they need no external API.
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from langchain.vectorstores import Qdrant
+from qdrant_client import QdrantClient
+
+from agent_indexer import (
+    chunk_markdown,
+    chunk_point_id,
+    default_collection_name,
+    get_index_state_path,
+    index_agent_documents,
+    load_index_cursor,
+    save_index_cursor,
+)
+from ai_agent_utils import commit_agent_paths, drop_off_document, get_head_commit, load_config
+
+
+JOURNAL = """# Journal
+
+Summary of the day.
+
+## Progress
+
+Fixed the retry loop.
+
+## Blockers
+
+Waiting on credentials.
+"""
+
+
+@contextmanager
+def temporary_repo():
+    """Run a test inside a throwaway git repository."""
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp)
+        for cmd in (
+            ["git", "init", "-q"],
+            ["git", "config", "user.name", "Test"],
+            ["git", "config", "user.email", "test@example.com"],
+            ["git", "config", "commit.gpgsign", "false"],
+        ):
+            subprocess.run(cmd, cwd=repo, check=True, capture_output=True)
+        os.chdir(repo)
+        try:
+            yield repo
+        finally:
+            os.chdir(previous_cwd)
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings that record how many texts were embedded."""
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[byte / 255 for byte in hashlib.sha256(text.encode()).digest()[:8]] for text in texts]
+
+
+def test_chunk_markdown():
+    """Test splitting markdown along headings."""
+    print("Testing markdown chunking...")
+
+    chunks = chunk_markdown(JOURNAL)
+    assert [chunk["heading"] for chunk in chunks] == ["Journal", "Journal > Progress", "Journal > Blockers"]
+    assert chunks[1]["text"] == "## Progress\n\nFixed the retry loop."
+
+    # Preamble, bare headings, fenced code and sibling levels
+    text = "Preamble.\n\n# A\n## B\n\n```\n# not a heading\n```\n\n### C\n\nc\n\n## D\n\nd"
+    chunks = chunk_markdown(text)
+    assert [chunk["heading"] for chunk in chunks] == ["", "A > B", "A > B > C", "A > D"]
+    assert "# not a heading" in chunks[1]["text"], "Should ignore headings in code blocks"
+
+    # Long sections are split on paragraphs
+    long_text = "# Long\n\n" + "\n\n".join("word " * 40 for _ in range(10))
+    chunks = chunk_markdown(long_text, max_chars=500)
+    assert len(chunks) > 1 and all(len(chunk["text"]) <= 500 for chunk in chunks)
+    assert all(chunk["heading"] == "Long" for chunk in chunks)
+
+    assert chunk_markdown("   \n") == [], "Should skip empty documents"
+    assert chunk_point_id("a.md", "x") != chunk_point_id("b.md", "x"), "Ids should depend on the path"
+
+    print("  ✅ Markdown chunking tests passed")
+
+
+def test_index_agent_documents():
+    """Test incremental indexing into Qdrant."""
+    print("Testing agent document indexing...")
+
+    with temporary_repo() as repo:
+        client = QdrantClient(":memory:")
+        embeddings = FakeEmbeddings()
+        collection = default_collection_name(repo)
+        journal = drop_off_document(JOURNAL, "journal", agent_name="alpha", timestamp="20250101_090000")
+        drop_off_document("# Todo\n\n- [ ] Rotate keys", "todo", agent_name="beta", timestamp="20250101_100000")
+
+        result = index_agent_documents(client, embeddings.embed_documents)
+        assert result["collection_name"] == collection
+        assert (result["documents"], result["chunks_embedded"]) == (2, 4)
+        assert client.count(collection).count == 4
+        assert load_index_cursor(repo, collection) == get_head_commit(repo), "Should save the cursor"
+
+        # Nothing new: nothing embedded
+        result = index_agent_documents(client, embeddings.embed_documents)
+        assert result["documents"] == 0 and len(embeddings.texts) == 4
+
+        # An edit re-embeds only the changed section and drops the stale chunk
+        journal.write_text(JOURNAL.replace("Waiting on credentials.", "Unblocked."))
+        commit_agent_paths(repo, [journal.relative_to(repo)], "Edit journal")
+        result = index_agent_documents(client, embeddings.embed_documents)
+        assert (result["chunks_embedded"], result["chunks_skipped"], result["chunks_deleted"]) == (1, 2, 1)
+        assert embeddings.texts[-1] == "## Blockers\n\nUnblocked."
+        assert client.count(collection).count == 4
+
+        # Payloads match langchain's layout, so /retrieve can search them
+        point = client.search(collection, embeddings.embed_documents(["## Blockers\n\nUnblocked."])[0], limit=1)[0]
+        document = Qdrant._document_from_scored_point(point, "page_content", "metadata")
+        assert document.page_content == "## Blockers\n\nUnblocked."
+        assert document.metadata["agent_name"] == "alpha"
+        assert document.metadata["heading"] == "Journal > Blockers"
+
+        # A removed collection is rebuilt from scratch
+        client.delete_collection(collection)
+        result = index_agent_documents(client, embeddings.embed_documents)
+        assert result["documents"] == 2 and client.count(collection).count == 4
+
+    # A repository with its own layout is indexed from any working directory
+    with temporary_repo() as repo:
+        (repo / ".ai_agent_config").write_text("AGENT_DOCS_DIR=agent_docs\nJOURNAL_DIR=logs\n")
+        config = load_config(repo)
+        drop_off_document("# Journal\n\nCustom layout.", "journal", agent_name="alpha",
+                          timestamp="20250101_090000")
+        assert list((repo / "agent_docs" / "logs").glob("*.md")), "Should use the custom layout"
+        with temporary_repo():
+            client = QdrantClient(":memory:")
+            result = index_agent_documents(client, FakeEmbeddings().embed_documents, "custom", repo_root=repo)
+            assert result["documents"] == 1, "Should diff the repository's own document directories"
+            assert get_index_state_path(repo, config) == repo / "agent_docs" / ".agent_index_state.json"
+            assert load_index_cursor(repo, "custom", config) == result["cursor"]
+            assert get_index_state_path(repo).exists(), "Should store the cursor in the repository's docs dir"
+
+    # Concurrent cursor updates for different collections don't lose each other
+    with temporary_repo() as repo:
+        threads = [
+            threading.Thread(target=lambda i=i: [save_index_cursor(repo, f"c{i}", f"{n:040x}") for n in range(20)])
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(load_index_cursor(repo, f"c{i}") == f"{19:040x}" for i in range(8)), "Should keep every cursor"
+        assert not list(get_index_state_path(repo).parent.glob("*.tmp")), "Should not leave temporary files"
+
+    print("  ✅ Agent document indexing tests passed")
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 70)
+    print("Running Agent Indexer Tests")
+    print("=" * 70)
+    print()
+
+    try:
+        test_chunk_markdown()
+        test_index_agent_documents()
+
+        print()
+        print("=" * 70)
+        print("✅ All tests passed!")
+        print("=" * 70)
+        return 0
+
+    except AssertionError as e:
+        print()
+        print("=" * 70)
+        print(f"❌ Test failed: {e}")
+        print("=" * 70)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())
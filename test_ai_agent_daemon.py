@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Simple tests for the AI agent drop-off daemon.
+
+These tests run the daemon in-process on a Unix socket inside throwaway git
+repositories.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from ai_agent_daemon import DropOffClient, DropOffServer, DropOffService
+from ai_agent_utils import drop_off_document
+
+
+@contextmanager
+def temporary_repo():
+    """Run a test inside a throwaway git repository."""
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp)
+        for cmd in (
+            ["git", "init", "-q"],
+            ["git", "config", "user.name", "Test"],
+            ["git", "config", "user.email", "test@example.com"],
+            ["git", "config", "commit.gpgsign", "false"],
+        ):
+            subprocess.run(cmd, cwd=repo, check=True, capture_output=True)
+        os.chdir(repo)
+        try:
+            yield repo
+        finally:
+            os.chdir(previous_cwd)
+
+
+def _commit_count(repo: Path) -> int:
+    """Return the number of commits reachable from HEAD."""
+    result = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=repo,
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout)
+
+
+def test_drop_off_daemon():
+    """Test the drop-off daemon protocol and commit batching."""
+    print("Testing drop-off daemon...")
+
+    with temporary_repo() as repo:
+        subprocess.run(["git", "commit", "-q", "--allow-empty", "-m", "Initial commit"],
+                       cwd=repo, check=True, capture_output=True)
+        service = DropOffService(repo, batch_window=0.05)
+        server = DropOffServer(repo / ".daemon.sock", service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with DropOffClient(repo / ".daemon.sock") as client:
+                assert client.request("ping") == "pong"
+                path = client.drop_off("# Journal\n\nFrom the daemon.", "journal", agent_name="remote")
+                assert Path(path).read_text() == "# Journal\n\nFrom the daemon."
+                assert client.list(agent_name="remote") == [path]
+
+                try:
+                    client.drop_off("   ", "journal")
+                    assert False, "Should reject empty content"
+                except RuntimeError as e:
+                    assert "ValueError" in str(e)
+                assert client.request("ping") == "pong", "Connection should survive errors"
+
+                # Reads are limited to journals and todos; timestamps must be well formed
+                assert client.request("read", path=path) == "# Journal\n\nFrom the daemon."
+                for outside in ("/etc/hostname", str(repo / ".git" / "HEAD"), "ai_agents/journals/../../x.md"):
+                    try:
+                        client.request("read", path=outside)
+                        assert False, f"Should refuse to read {outside}"
+                    except RuntimeError as e:
+                        assert "Not an agent document" in str(e)
+                try:
+                    client.drop_off("# Journal", "journal", timestamp="../../../escape")
+                    assert False, "Should reject a malformed timestamp"
+                except RuntimeError as e:
+                    assert "Invalid timestamp" in str(e)
+                assert not list(repo.rglob("*escape*")), "Should not write outside the docs directory"
+
+            # The service answers for its own repository, whatever the working directory
+            with temporary_repo() as other:
+                drop_off_document("# Journal\n\nOther repository.", "journal", agent_name="local")
+                with DropOffClient(repo / ".daemon.sock") as client:
+                    assert client.list() == [path], "Should list the served repository"
+                    results = client.search("daemon")
+                    assert [r["path"] for r in results] == [path], "Should search the served repository"
+                    assert client.search("Other") == []
+
+            # Concurrent drops are batched into fewer commits
+            commits = _commit_count(repo)
+
+            def drop(index):
+                with DropOffClient(repo / ".daemon.sock") as client:
+                    return client.drop_off(f"# Todo {index}\n\n- [ ] Task {index}", "todo",
+                                           agent_name=f"agent_{index}",
+                                           timestamp=f"20250101_0000{index:02d}")
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                paths = list(pool.map(drop, range(8)))
+            assert len(set(paths)) == 8
+            assert _commit_count(repo) - commits < 8, "Should batch concurrent drops"
+            status = subprocess.run(["git", "status", "--porcelain", "--", ".", ":!ai_agents/.search_index.db*"],
+                                    cwd=repo, capture_output=True, text=True).stdout
+            assert status == "", "Every drop should be committed"
+
+            # Long-polling for changes wakes up on the next commit
+            with DropOffClient(repo / ".daemon.sock") as client:
+                cursor = client.changes()["cursor"]
+                timer = threading.Timer(0.05, drop, (9,))
+                timer.start()
+                batch = client.changes(cursor, wait=5, include_content=False)
+                timer.join()
+                assert [c["agent_name"] for c in batch["changes"]] == ["agent_9"]
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+        assert not (repo / ".daemon.sock").exists(), "Should remove the socket on close"
+
+    print("  ✅ Drop-off daemon tests passed")
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 70)
+    print("Running AI Agent Daemon Tests")
+    print("=" * 70)
+    print()
+
+    try:
+        test_drop_off_daemon()
+
+        print()
+        print("=" * 70)
+        print("✅ All tests passed!")
+        print("=" * 70)
+        return 0
+
+    except AssertionError as e:
+        print()
+        print("=" * 70)
+        print(f"❌ Test failed: {e}")
+        print("=" * 70)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())
@@ -6,8 +6,14 @@ This file provides basic validation of the core functionality.
 Note: These tests create real commits in the repository.
 """
 
+import asyncio
+import json
 import os
+import re
 import sys
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 import subprocess
@@ -20,9 +26,49 @@ from ai_agent_utils import (
     save_agent_document,
     load_config,
     list_agent_documents,
+    drop_off_document,
+    parse_document_filename,
+    rebuild_search_index,
+    search_agent_documents,
+    parse_todo_markdown,
+    load_todo_items,
+    query_todo_items,
+    count_todo_items,
+    create_agent_bundles,
+    load_bundle_templates,
+    compact_agent_documents,
+    read_agent_document,
+    changes_since,
+    follow_changes,
+    follow_changes_async,
+    get_head_commit,
+    commit_agent_paths,
 )
 
 
+TEMPLATES_FILE = Path(__file__).resolve().parent / "agent_bundle_templates.md"
+
+
+@contextmanager
+def temporary_repo():
+    """Run a test inside a throwaway git repository."""
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp)
+        for cmd in (
+            ["git", "init", "-q"],
+            ["git", "config", "user.name", "Test"],
+            ["git", "config", "user.email", "test@example.com"],
+            ["git", "config", "commit.gpgsign", "false"],
+        ):
+            subprocess.run(cmd, cwd=repo, check=True, capture_output=True)
+        os.chdir(repo)
+        try:
+            yield repo
+        finally:
+            os.chdir(previous_cwd)
+
+
 def test_validate_document_content():
     """Test document validation."""
     print("Testing document validation...")
@@ -66,6 +112,12 @@ def test_generate_filename():
     custom_timestamp = "20250115_120000"
     custom_name = generate_filename("journal", "agent", custom_timestamp)
     assert custom_timestamp in custom_name, "Should use custom timestamp"
+    for bad_timestamp in ("../../etc/x", "2025-01-15", "20250115_120000/.."):
+        try:
+            generate_filename("journal", "agent", bad_timestamp)
+            assert False, f"Should reject timestamp {bad_timestamp!r}"
+        except ValueError:
+            pass  # Expected
     
     # Test invalid doc_type
     try:
@@ -178,6 +230,281 @@ def test_sanitization():
     print("  ✅ Agent name sanitization tests passed")
 
 
+def test_parse_document_filename():
+    """Test parsing generated filenames."""
+    print("Testing filename parsing...")
+    
+    parsed = parse_document_filename("journal_20250115_120000_my_agent.md")
+    assert parsed["doc_type"] == "journal", "Should detect doc type"
+    assert parsed["timestamp"] == datetime(2025, 1, 15, 12, 0, 0), "Should parse timestamp"
+    assert parsed["agent_name"] == "my_agent", "Should keep underscores in agent name"
+    
+    assert parse_document_filename("README.md") is None, "Should reject other files"
+    assert parse_document_filename("todo_short.md") is None, "Should reject malformed names"
+    
+    print("  ✅ Filename parsing tests passed")
+
+
+def test_search_agent_documents():
+    """Test the full-text search index."""
+    print("Testing document search...")
+    
+    with temporary_repo() as repo:
+        drop_off_document("# Debug\n\nHit a ConnectionResetError in the uploader.",
+                          "journal", agent_name="alpha", timestamp="20250101_090000")
+        drop_off_document("# Plan\n\n- [ ] Retry uploader on ConnectionResetError",
+                          "todo", agent_name="beta", timestamp="20250301_090000")
+        drop_off_document("# Notes\n\nNothing unusual today.",
+                          "journal", agent_name="beta", timestamp="20250302_090000")
+        
+        # First search builds the index
+        results = search_agent_documents("connectionreseterror")
+        assert len(results) == 2, "Should match by content, case-insensitively"
+        assert all(r["snippet"] for r in results), "Should include snippets"
+        
+        assert [r["agent_name"] for r in search_agent_documents("uploader", doc_type="journal")] == ["alpha"]
+        assert [r["doc_type"] for r in search_agent_documents("uploader", agent_name="beta")] == ["todo"]
+        assert len(search_agent_documents("uploader", since="2025-02-01")) == 1, "Should filter by time"
+        assert search_agent_documents("uploader unusual") == [], "All words must match"
+        
+        # Drop-offs update the existing index incrementally
+        drop_off_document("# Fix\n\nPatched the uploader.", "journal",
+                          agent_name="gamma", timestamp="20250401_090000")
+        assert len(search_agent_documents("uploader")) == 3, "Should index new drop-offs"
+        
+        # Rebuilds only reprocess changed files
+        assert rebuild_search_index()["indexed"] == 0, "Nothing should need re-indexing"
+        todo = next(repo.glob("ai_agents/todos/*.md"))
+        todo.write_text("# Plan\n\n- [x] Done")
+        counts = rebuild_search_index()
+        assert counts["indexed"] == 1 and counts["unchanged"] == 3, "Should re-index only the edited file"
+        assert len(search_agent_documents("uploader")) == 2, "Should drop stale content"
+    
+    print("  ✅ Document search tests passed")
+
+
+def test_parse_todo_markdown():
+    """Test parsing todo markdown into items."""
+    print("Testing todo parsing...")
+    
+    items = parse_todo_markdown(
+        "# Todo\n"
+        "## High Priority Tasks 🔴\n"
+        "- [ ] **Fix uploader**\n"
+        "  - Description: not an item\n"
+        "## Low Priority Tasks 🟢\n"
+        "- [X] Tidy docs\n"
+        "## Completed Tasks ✅\n"
+        "- [x] Ship v1\n",
+        agent_name="alpha"
+    )
+    assert [i.text for i in items] == ["Fix uploader", "Tidy docs", "Ship v1"], "Should find checkbox items"
+    assert [i.status for i in items] == ["open", "done", "done"], "Should read status"
+    assert [i.priority for i in items] == ["high", "low", None], "Should take priority from headings"
+    assert items[0].section == "High Priority Tasks 🔴" and items[0].line == 3, "Should record location"
+    assert items[0].agent_name == "alpha", "Should attach the agent name"
+    assert not hasattr(items[0], "__dict__"), "Items should use __slots__"
+    
+    # Only "<level> priority" counts, and sub-headings inherit their parent's priority
+    items = parse_todo_markdown(
+        "## Workflow improvements\n- [ ] W\n"
+        "## Follow-up\n- [ ] F\n"
+        "## Highlights\n- [ ] H\n"
+        "## High Priority Tasks\n"
+        "### Backend\n- [ ] B\n"
+        "### Low priority cleanup\n- [ ] C\n"
+        "## Medium priority\n- [ ] M\n"
+    )
+    assert [(i.text, i.priority) for i in items] == [
+        ("W", None), ("F", None), ("H", None), ("B", "high"), ("C", "low"), ("M", "medium")
+    ], "Should match whole priority words and inherit by heading level"
+    
+    print("  ✅ Todo parsing tests passed")
+
+
+def test_query_todo_items():
+    """Test cached todo aggregation across agents."""
+    print("Testing todo aggregation...")
+    
+    with temporary_repo() as repo:
+        todo_dir = repo / "ai_agents" / "todos"
+        todo_dir.mkdir(parents=True)
+        (todo_dir / "todo_20250101_090000_alpha.md").write_text(
+            "## High Priority\n- [ ] A1\n- [x] A2\n## Medium Priority\n- [ ] A3\n")
+        (todo_dir / "todo_20250201_090000_alpha.md").write_text("## High Priority\n- [ ] A4\n")
+        beta = todo_dir / "todo_20250101_090000_beta.md"
+        beta.write_text("## High Priority\n- [ ] B1\n")
+        
+        open_high = query_todo_items(status="open", priority="high")
+        assert sorted(i.text for i in open_high) == ["A1", "A4", "B1"], "Should aggregate across agents"
+        assert count_todo_items(status="open", priority="high") == {"alpha": 2, "beta": 1}
+        assert count_todo_items(group_by="status") == {"open": 4, "done": 1}
+        assert [i.text for i in query_todo_items(agent_name="alpha", latest_only=True)] == ["A4"]
+        
+        # Unchanged files are served from the cache
+        first = load_todo_items(beta)
+        assert load_todo_items(beta) is first, "Should reuse the cached parse"
+        beta.write_text("## High Priority\n- [x] B1\n- [ ] B2\n")
+        assert [i.status for i in load_todo_items(beta)] == ["done", "open"], "Should re-parse changed files"
+    
+    print("  ✅ Todo aggregation tests passed")
+
+
+def _commit_count(repo: Path) -> int:
+    """Return the number of commits reachable from HEAD."""
+    result = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=repo,
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout)
+
+
+def test_load_bundle_templates():
+    """Test extracting bundle templates from the templates document."""
+    print("Testing bundle template loading...")
+    
+    names = [name for name, _ in load_bundle_templates(TEMPLATES_FILE)]
+    assert names == ["agents.md", "rules.md", "journal.md", "todos.md", "features.md",
+                     "project_summary.md", "srs.md", "bundle.json"], "Should find every bundle file"
+    assert load_bundle_templates(TEMPLATES_FILE) is load_bundle_templates(TEMPLATES_FILE), \
+        "Should compile templates once"
+    
+    print("  ✅ Bundle template loading tests passed")
+
+
+def test_create_agent_bundles():
+    """Test batch bundle creation."""
+    print("Testing agent bundle creation...")
+    
+    with temporary_repo() as repo:
+        subprocess.run(["git", "commit", "-q", "--allow-empty", "-m", "init"], cwd=repo, check=True)
+        
+        # Plain collection directory: one commit in the main repository
+        bundles = create_agent_bundles(3, templates_file=TEMPLATES_FILE)
+        assert len(bundles) == 3 and _commit_count(repo) == 2, "Should commit the batch once"
+        bundle = bundles[0]
+        bundle_id = bundle.name[len("agent_bundle_"):]
+        agents = (bundle / "agents.md").read_text()
+        assert f"**Bundle ID:** {bundle_id}" in agents, "Bundle ID should match the directory"
+        for rendered in bundle.iterdir():
+            assert "{{" not in rendered.read_text(), f"Placeholders should be filled in {rendered.name}"
+        todo_id = re.search(r"### TODO: (\S+)", (bundle / "todos.md").read_text()).group(1)
+        assert f"pytest -q tests/test_todo_{todo_id}.py" in (bundle / "todos.md").read_text()
+        assert f"- TODO {todo_id} —" in (bundle / "project_summary.md").read_text(), \
+            "{{GUID}} should render to the bundle's TODO id"
+        assert json.loads((bundle / "bundle.json").read_text())["bundle_id"] == bundle_id
+    
+    with temporary_repo() as repo:
+        subprocess.run(["git", "commit", "-q", "--allow-empty", "-m", "init"], cwd=repo, check=True)
+        collection = repo / "collection"
+        collection.mkdir()
+        for cmd in (["git", "init", "-q"], ["git", "config", "user.name", "Test"],
+                    ["git", "config", "user.email", "test@example.com"],
+                    ["git", "commit", "-q", "--allow-empty", "-m", "init"]):
+            subprocess.run(cmd, cwd=collection, check=True, capture_output=True)
+        
+        # Submodule collection: one commit there, one pointer update here
+        create_agent_bundles(50, templates_file=TEMPLATES_FILE, include_manifest=False)
+        assert _commit_count(collection) == 2, "Should commit the batch once in the submodule"
+        assert _commit_count(repo) == 2, "Should update the submodule pointer once"
+        assert len(list(collection.glob("agent_bundle_*/*.md"))) == 50 * 7, "Should write every file"
+        assert not list(collection.glob("agent_bundle_*/bundle.json")), "Manifest should be optional"
+    
+    print("  ✅ Agent bundle creation tests passed")
+
+
+def test_compact_agent_documents():
+    """Test archive compaction and transparent reads."""
+    print("Testing archive compaction...")
+    
+    with temporary_repo() as repo:
+        contents = {}
+        for timestamp, agent in (("20250105_090000", "alpha"), ("20250120_090000", "beta"),
+                                 ("20250210_090000", "alpha"), ("20250615_090000", "alpha")):
+            path = drop_off_document(f"# Journal {timestamp}\n\nWorked on {agent} tasks.",
+                                     "journal", agent_name=agent, timestamp=timestamp)
+            contents[path] = path.read_text()
+        before = list_agent_documents()
+        commits = _commit_count(repo)
+        
+        result = compact_agent_documents("2025-03-01")
+        assert result["archived"] == 3 and len(result["packs"]) == 2, "Should pack per month"
+        assert _commit_count(repo) == commits + 1, "Should commit the compaction once"
+        status = subprocess.run(["git", "status", "--porcelain"], cwd=repo,
+                                capture_output=True, text=True).stdout
+        assert status == "", "Compaction should leave a clean tree"
+        assert len(list(repo.glob("ai_agents/journals/*.md"))) == 1, "Should remove archived originals"
+        
+        # Archived documents are listed and read like live ones
+        assert list_agent_documents() == before, "Listing should include archived documents"
+        assert len(list_agent_documents(include_archived=False)) == 1
+        assert len(list_agent_documents(agent_name="alpha")) == 3
+        for path, content in contents.items():
+            assert read_agent_document(path) == content, "Should read archived and live documents"
+        assert len(search_agent_documents("alpha tasks")) == 3, "Search should cover archived documents"
+        
+        # Compacting again is a no-op
+        assert compact_agent_documents("2025-03-01")["archived"] == 0
+        try:
+            read_agent_document(repo / "ai_agents" / "journals" / "journal_20250101_000000_nobody.md")
+            assert False, "Should raise FileNotFoundError"
+        except FileNotFoundError:
+            pass  # Expected
+    
+    print("  ✅ Archive compaction tests passed")
+
+
+def test_changes_since():
+    """Test the commit-cursor change feed."""
+    print("Testing changes_since...")
+    
+    with temporary_repo() as repo:
+        assert changes_since() == {"cursor": None, "changes": []}, "Should handle an empty repository"
+        first = drop_off_document("# Journal\n\nFirst.", "journal", agent_name="alpha",
+                                  timestamp="20250101_090000")
+        drop_off_document("# Todo\n\n- [ ] One", "todo", agent_name="beta", timestamp="20250101_100000")
+        
+        initial = changes_since()
+        assert [c["status"] for c in initial["changes"]] == ["added", "added"]
+        assert initial["cursor"] == get_head_commit(repo)
+        assert initial["changes"][0]["content"] == "# Journal\n\nFirst."
+        assert changes_since(initial["cursor"])["changes"] == [], "Nothing new at HEAD"
+        assert len(changes_since(doc_type="todo")["changes"]) == 1
+        
+        # Modified and added documents are reported; other files are not
+        first.write_text("# Journal\n\nFirst, edited.")
+        (repo / "notes.md").write_text("unrelated")
+        commit_agent_paths(repo, [first.relative_to(repo), "notes.md"], "Edit journal")
+        third = drop_off_document("# Journal\n\nThird.", "journal", agent_name="gamma",
+                                  timestamp="20250102_090000")
+        
+        batch = changes_since(initial["cursor"], include_content=False)
+        assert [(Path(c["path"]), c["status"]) for c in batch["changes"]] == [
+            (first, "modified"), (third, "added")]
+        assert "content" not in batch["changes"][0]
+        assert batch["changes"][1]["agent_name"] == "gamma"
+        
+        try:
+            changes_since("0" * 40)
+            assert False, "Should raise ValueError"
+        except ValueError:
+            pass  # Expected
+        
+        # Following picks up new commits
+        cursor = batch["cursor"]
+        assert list(follow_changes(cursor, poll_interval=0.01, timeout=0.05)) == []
+        timer = threading.Timer(0.05, drop_off_document, ("# Todo\n\n- [ ] Two", "todo"),
+                                {"agent_name": "beta", "timestamp": "20250103_090000"})
+        timer.start()
+        followed = next(follow_changes(cursor, poll_interval=0.01, timeout=5))
+        timer.join()
+        assert [c["content"] for c in followed["changes"]] == ["# Todo\n\n- [ ] Two"]
+        
+        async def follow_async():
+            return [batch async for batch in follow_changes_async(poll_interval=0.01, timeout=0)]
+        assert len(asyncio.run(follow_async())[0]["changes"]) == 4
+    
+    print("  ✅ changes_since tests passed")
+
+
 def run_all_tests():
     """Run all tests."""
     print("=" * 70)
@@ -193,6 +520,14 @@ def run_all_tests():
         test_save_agent_document()
         test_list_agent_documents()
         test_sanitization()
+        test_parse_document_filename()
+        test_search_agent_documents()
+        test_parse_todo_markdown()
+        test_query_todo_items()
+        test_load_bundle_templates()
+        test_create_agent_bundles()
+        test_compact_agent_documents()
+        test_changes_since()
         
         print()
         print("=" * 70)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Simple tests for the RAG service routes.
+
+These tests use Flask's test client with answer_query stubbed out, so they
+exercise request validation, coalescing and backpressure handling without
+touching any external API.
+"""
+
+import sys
+import threading
+import time
+
+import app as rag_app
+from rag_utils import UpstreamRejected
+
+
+def _retrieve(client, **body):
+    body.setdefault("collection_name", "docs")
+    body.setdefault("query", "What is Qdrant?")
+    return client.post("/retrieve", json=body)
+
+
+def test_retrieve_validation():
+    """Test that invalid /retrieve parameters are rejected with 400."""
+    print("Testing /retrieve validation...")
+
+    client = rag_app.app.test_client()
+    original = rag_app.answer_query
+    rag_app.answer_query = lambda *args: "answer"
+    try:
+        assert _retrieve(client).json == {"results": "answer"}
+        for k in ("abc", 0, -1, 1.5, True):
+            assert _retrieve(client, k=k).status_code == 400, f"Should reject k={k!r}"
+        assert _retrieve(client, ef=0).status_code == 400, "Should reject ef=0"
+        assert _retrieve(client, ef=[64]).status_code == 400, "Should reject a list ef"
+        assert _retrieve(client, rescore=["yes"]).status_code == 400, "Should reject a list rescore"
+        assert _retrieve(client, rescore={"a": 1}).status_code == 400, "Should reject an object rescore"
+        for field in ("query", "collection_name"):
+            assert client.post("/retrieve", json={field: "x"}).status_code == 400, "Should require both fields"
+            assert _retrieve(client, **{field: 42}).status_code == 400, f"Should reject a non-string {field}"
+            assert _retrieve(client, **{field: None}).status_code == 400, f"Should reject a null {field}"
+    finally:
+        rag_app.answer_query = original
+
+    print("  ✅ /retrieve validation tests passed")
+
+
+def test_retrieve_single_flight():
+    """Test that identical /retrieve requests share one run and followers time out."""
+    print("Testing /retrieve coalescing...")
+
+    client = rag_app.app.test_client()
+    original = rag_app.answer_query
+    original_timeout = rag_app.single_flight_timeout
+    calls = []
+    release = threading.Event()
+
+    def slow_answer(collection_name, query, k, search_params, deadline):
+        calls.append(query)
+        release.wait(5)
+        return "shared answer"
+
+    rag_app.answer_query = slow_answer
+    try:
+        coalesced = rag_app.retrieve_flight.stats["coalesced"]
+        responses = []
+        threads = [
+            threading.Thread(target=lambda q=q: responses.append(_retrieve(rag_app.app.test_client(), query=q)))
+            for q in ("What is Qdrant?", "  what is   QDRANT? ", "What is Qdrant?")
+        ]
+        for thread in threads:
+            thread.start()
+        give_up = time.monotonic() + 5
+        while rag_app.retrieve_flight.stats["coalesced"] < coalesced + 2 and time.monotonic() < give_up:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1, "Identical queries should share one run"
+        assert [r.json for r in responses] == [{"results": "shared answer"}] * 3
+
+        # Followers give up with 504 while the leader is still running
+        release.clear()
+        rag_app.single_flight_timeout = 0.05
+        leader = threading.Thread(target=lambda: _retrieve(rag_app.app.test_client(), query="slow"))
+        leader.start()
+        while rag_app.retrieve_flight.in_flight() == 0:
+            time.sleep(0.01)
+        assert _retrieve(client, query="slow").status_code == 504, "Followers should time out"
+        release.set()
+        leader.join()
+    finally:
+        release.set()
+        rag_app.answer_query = original
+        rag_app.single_flight_timeout = original_timeout
+
+    print("  ✅ /retrieve coalescing tests passed")
+
+
+def test_upstream_rejected_response():
+    """Test that UpstreamRejected maps to 429/503 with Retry-After."""
+    print("Testing upstream rejection responses...")
+
+    client = rag_app.app.test_client()
+    original = rag_app.answer_query
+    try:
+        for status, retry_after, header in ((429, 1.2, "2"), (503, 3, "3")):
+            def rejected(*args, status=status, retry_after=retry_after):
+                raise UpstreamRejected("openai", "busy", status, retry_after)
+            rag_app.answer_query = rejected
+            response = _retrieve(client, query=f"rejected {status}")
+            assert response.status_code == status
+            assert response.headers["Retry-After"] == header, "Should round Retry-After up"
+            assert response.json["upstream"] == "openai"
+    finally:
+        rag_app.answer_query = original
+
+    print("  ✅ Upstream rejection response tests passed")
+
+
+def test_index_agents_collection_name():
+    """Test that /index_agents resolves the default collection name before coalescing."""
+    print("Testing /index_agents collection names...")
+
+    client = rag_app.app.test_client()
+    original = rag_app.index_agents_run
+    runs = []
+    rag_app.index_agents_run = lambda collection_name, *args: runs.append(collection_name) or {"collection_name": collection_name}
+    try:
+        default = rag_app.default_collection_name(rag_app.agent_repo_path or rag_app.get_repo_root())
+        assert client.post("/index_agents", json={}).json == {"collection_name": default}
+        assert client.post("/index_agents", json={"collection_name": default}).json == {"collection_name": default}
+        assert runs == [default, default], "Should key runs on the resolved name"
+        for name in (42, ["docs"], ""):
+            assert client.post("/index_agents", json={"collection_name": name}).status_code == 400, f"Should reject {name!r}"
+    finally:
+        rag_app.index_agents_run = original
+
+    print("  ✅ /index_agents collection name tests passed")
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 70)
+    print("Running RAG Service Route Tests")
+    print("=" * 70)
+    print()
+
+    try:
+        test_retrieve_validation()
+        test_retrieve_single_flight()
+        test_upstream_rejected_response()
+        test_index_agents_collection_name()
+
+        print()
+        print("=" * 70)
+        print("✅ All tests passed!")
+        print("=" * 70)
+        return 0
+
+    except AssertionError as e:
+        print()
+        print("=" * 70)
+        print(f"❌ Test failed: {e}")
+        print("=" * 70)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Simple tests for the RAG service utilities.
+
+These tests exercise the concurrency helpers without touching any
+external API.
+"""
+
+import sys
+import threading
+import time
+
+from rag_utils import (
+    SingleFlight,
+    UpstreamLimiter,
+    UpstreamRejected,
+    build_collection_config,
+    build_search_params,
+    normalize_query,
+)
+
+
+def test_normalize_query():
+    """Test query normalization."""
+    print("Testing query normalization...")
+
+    assert normalize_query("  What is   Qdrant? ") == "what is qdrant?", "Should collapse whitespace and case"
+    assert normalize_query("a\tb\nc") == "a b c", "Should treat all whitespace alike"
+
+    print("  ✅ Query normalization tests passed")
+
+
+def test_single_flight_coalesces():
+    """Test that concurrent identical calls share one execution."""
+    print("Testing single-flight coalescing...")
+
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("key", work)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.stats["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1, "Work should run exactly once"
+    assert results == ["answer"] * 5, "Every caller should get the leader's result"
+    assert flight.in_flight() == 0, "Key should be forgotten after completion"
+
+    # No long-lived cache: a later call runs again
+    flight.do("key", work)
+    assert len(calls) == 2, "Completed calls should not be cached"
+
+    print("  ✅ Single-flight coalescing tests passed")
+
+
+def test_single_flight_errors_and_timeouts():
+    """Test error propagation and follower timeouts."""
+    print("Testing single-flight errors and timeouts...")
+
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats["coalesced"] < 1:
+        time.sleep(0.01)
+
+    # A follower with a short timeout gives up without stopping the leader
+    try:
+        flight.do("key", failing, timeout=0.05)
+        assert False, "Should raise TimeoutError"
+    except TimeoutError:
+        pass  # Expected
+
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ["upstream failed"] * 2, "Leader and follower should both see the error"
+
+    print("  ✅ Single-flight error and timeout tests passed")
+
+
+def test_upstream_limiter_concurrency():
+    """Test the concurrency cap, queue bound and deadline."""
+    print("Testing upstream limiter concurrency...")
+
+    limiter = UpstreamLimiter("test", max_concurrency=1, max_queue=1)
+    limiter.acquire()
+    assert limiter.snapshot()["in_flight"] == 1, "Should count the admitted call"
+
+    # One caller may queue; it gives up at its deadline with 503
+    outcome = []
+
+    def queued():
+        try:
+            limiter.acquire(deadline=time.monotonic() + 0.2)
+        except UpstreamRejected as e:
+            outcome.append(e.status)
+
+    thread = threading.Thread(target=queued)
+    thread.start()
+    while limiter.snapshot()["queue_depth"] < 1:
+        time.sleep(0.01)
+
+    # The queue is full, so the next caller is rejected immediately
+    try:
+        limiter.acquire(deadline=time.monotonic() + 10)
+        assert False, "Should reject when the queue is full"
+    except UpstreamRejected as e:
+        assert e.status == 503, "Queue overflow should map to 503"
+
+    thread.join()
+    assert outcome == [503], "Queued caller should time out with 503"
+
+    limiter.release()
+    assert limiter.call(lambda x: x * 2, 21) == 42, "Should run the call once admitted"
+
+    snapshot = limiter.snapshot()
+    assert snapshot["queue_full"] == 1 and snapshot["timed_out"] == 1, "Should count rejections"
+    assert snapshot["in_flight"] == 0 and snapshot["queue_depth"] == 0, "Should be idle again"
+
+    print("  ✅ Upstream limiter concurrency tests passed")
+
+
+def test_upstream_limiter_rate():
+    """Test the token bucket."""
+    print("Testing upstream limiter rate limiting...")
+
+    limiter = UpstreamLimiter("test", max_concurrency=10, rate=20, burst=2)
+    for _ in range(2):
+        limiter.call(lambda: None, deadline=time.monotonic())
+
+    # Bucket is empty: a token is ~50ms away, beyond this deadline
+    try:
+        limiter.acquire(deadline=time.monotonic() + 0.01)
+        assert False, "Should reject when no token arrives before the deadline"
+    except UpstreamRejected as e:
+        assert e.status == 429, "Rate limiting should map to 429"
+        assert e.retry_after > 0, "Should suggest a back-off"
+
+    # With a longer deadline the caller waits for the next token
+    started = time.monotonic()
+    limiter.call(lambda: None, deadline=started + 1)
+    assert time.monotonic() - started >= 0.03, "Should wait for a token"
+
+    print("  ✅ Upstream limiter rate limiting tests passed")
+
+
+def test_build_collection_config():
+    """Test translating collection profiles into Qdrant settings."""
+    print("Testing collection profiles...")
+
+    # No profile keeps Qdrant defaults
+    assert build_collection_config(None) == ({}, {}), "Default profile should set nothing"
+
+    create_kwargs, payload_indexes = build_collection_config({
+        "hnsw": {"m": 8, "ef_construct": 64, "on_disk": True},
+        "quantization": {"type": "scalar", "quantile": 0.95, "always_ram": True},
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "payload_indexes": {"metadata.source": "keyword"},
+    })
+    assert create_kwargs["hnsw_config"].m == 8, "Should set HNSW m"
+    assert create_kwargs["hnsw_config"].ef_construct == 64, "Should set HNSW ef_construct"
+    assert create_kwargs["quantization_config"].scalar.quantile == 0.95, "Should set scalar quantization"
+    assert create_kwargs["optimizers_config"].memmap_threshold, "Should keep vectors on disk"
+    assert create_kwargs["on_disk_payload"] is True, "Should keep payload on disk"
+    assert payload_indexes["metadata.source"].value == "keyword", "Should index payload fields"
+
+    # Named presets
+    create_kwargs, _ = build_collection_config("low_memory")
+    assert create_kwargs["hnsw_config"].on_disk, "low_memory should keep the HNSW graph on disk"
+
+    # Invalid profiles
+    for invalid in ["nope", {"hnsw": {"m": 0}}, {"quantization": {"type": "binary"}},
+                    {"payload_indexes": {"x": "blob"}}, {"payload_indexes": ["x"]}, {"unknown": 1},
+                    {"quantization": {"type": "scalar", "quantile": 5}},
+                    {"quantization": {"type": "scalar", "quantile": 0.2}},
+                    {"quantization": {"type": "scalar", "always_ram": "yes"}},
+                    {"hnsw": {"on_disk": 1}}, {"on_disk_vectors": "true"}, {"on_disk_payload": []}]:
+        try:
+            build_collection_config(invalid)
+            assert False, f"Should reject profile {invalid}"
+        except ValueError:
+            pass  # Expected
+
+    print("  ✅ Collection profile tests passed")
+
+
+def test_build_search_params():
+    """Test search-time parameters."""
+    print("Testing search parameters...")
+
+    assert build_search_params() is None, "Should use server defaults"
+
+    params = build_search_params(ef=128, rescore=True)
+    assert params.hnsw_ef == 128, "Should set ef"
+    assert params.quantization.rescore is True, "Should set rescoring"
+
+    try:
+        build_search_params(ef=-1)
+        assert False, "Should reject a negative ef"
+    except ValueError:
+        pass  # Expected
+
+    try:
+        build_search_params(rescore=["yes"])
+        assert False, "Should reject a non-boolean rescore"
+    except ValueError:
+        pass  # Expected
+
+    print("  ✅ Search parameter tests passed")
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 70)
+    print("Running RAG Utils Tests")
+    print("=" * 70)
+    print()
+
+    try:
+        test_normalize_query()
+        test_single_flight_coalesces()
+        test_single_flight_errors_and_timeouts()
+        test_upstream_limiter_concurrency()
+        test_upstream_limiter_rate()
+        test_build_collection_config()
+        test_build_search_params()
+
+        print()
+        print("=" * 70)
+        print("✅ All tests passed!")
+        print("=" * 70)
+        return 0
+
+    except AssertionError as e:
+        print()
+        print("=" * 70)
+        print(f"❌ Test failed: {e}")
+        print("=" * 70)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())